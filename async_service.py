@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+from pattern_detector import PatternDetector
+from compression_engine import CompressionEngine, CompressionResult, Placeholder
+from restoration_engine import RestorationEngine
+from result_format import result_to_record, record_to_result
+
+class AsyncCompressionEngine:
+    # Requests queue up in a bounded asyncio.Queue (awaiting put() is the backpressure);
+    # a batcher drains it for at most batch_window seconds or max_batch_size documents and
+    # hands each batch to a worker pool, so the event loop never runs a regex scan itself.
+    def __init__(
+        self,
+        engine: CompressionEngine,
+        max_batch_size: int = 32,
+        batch_window: float = 0.002,
+        max_queue: int = 1024,
+        workers: Optional[int] = None,
+        executor: str = "process"
+    ):
+        if engine.codebook is not None:
+            raise ValueError("AsyncCompressionEngine uses per-document placeholder namespaces and cannot share a codebook")
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown executor: {executor!r}")
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_queue = max_queue
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.batches = 0
+        self.documents = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pool = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    async def start(self) -> "AsyncCompressionEngine":
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        pool_class = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+        self._pool = pool_class(max_workers=self.workers)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._run_batcher())
+        return self
+
+    async def close(self):
+        if self._batcher is None:
+            return
+        await self._queue.join()
+        self._batcher.cancel()
+        await asyncio.gather(self._batcher, *self._inflight, return_exceptions=True)
+        self._batcher = None
+        self._pool.shutdown()
+
+    async def __aenter__(self) -> "AsyncCompressionEngine":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def compress(self, text: str) -> CompressionResult:
+        if self._batcher is None:
+            raise RuntimeError("AsyncCompressionEngine is not started")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def restore(self, compressed_text: str, placeholders: Mapping[str, Placeholder]) -> Tuple[str, bool, List[str]]:
+        if self._batcher is None:
+            raise RuntimeError("AsyncCompressionEngine is not started")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, RestorationEngine.restore, compressed_text, placeholders)
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            texts = [text for text, _ in batch]
+            results = await loop.run_in_executor(self._pool, self.engine.compress_batch, texts, 1)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.batches += 1
+            self.documents += len(batch)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            self._slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+class CompressionServer:
+    # JSON lines over TCP or a Unix socket. Each request line is
+    # {"id": ..., "op": "compress", "text": ...} or {"id": ..., "op": "restore", <compress record>};
+    # responses echo the id and may arrive out of order when a connection pipelines requests.
+    def __init__(self, service: AsyncCompressionEngine, max_pending_per_connection: int = 256):
+        self.service = service
+        self.max_pending_per_connection = max_pending_per_connection
+        self.requests = 0
+        self.errors = 0
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pending = asyncio.Semaphore(self.max_pending_per_connection)
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await pending.acquire()
+                task = asyncio.create_task(self._respond(line, writer, pending))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter, pending: asyncio.Semaphore):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = await self.handle_request(request)
+        except Exception as exc:
+            self.errors += 1
+            response = {'error': f"{type(exc).__name__}: {exc}"}
+        finally:
+            pending.release()
+        response['id'] = request_id
+        self.requests += 1
+        writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle_request(self, request: Dict) -> Dict:
+        op = request.get('op', 'compress')
+        if op == 'compress':
+            return result_to_record(await self.service.compress(request['text']))
+        if op == 'restore':
+            result = record_to_result(request)
+            restored, integrity, errors = await self.service.restore(result.compressed_text, result.placeholders)
+            return {'text': restored, 'integrity': integrity, 'errors': errors}
+        if op == 'stats':
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.service.batches,
+                'documents': self.service.documents,
+                'queue_depth': self.service.queue_depth,
+            }
+        raise ValueError(f"Unknown op: {op!r}")
+
+async def serve(args):
+    detector = PatternDetector(min_length=args.min_length, safe=args.safe)
+    engine = CompressionEngine(detector, dedupe=args.dedupe)
+    async with AsyncCompressionEngine(
+        engine,
+        max_batch_size=args.max_batch,
+        batch_window=args.batch_window_ms / 1000,
+        max_queue=args.max_queue,
+        workers=args.workers,
+        executor=args.executor
+    ) as service:
+        server = CompressionServer(service)
+        if args.unix:
+            listener = await asyncio.start_unix_server(server.handle_connection, path=args.unix, limit=args.max_line)
+            print(f"Listening on unix:{args.unix}")
+        else:
+            listener = await asyncio.start_server(server.handle_connection, args.host, args.port, limit=args.max_line)
+            print(f"Listening on {args.host}:{args.port}")
+        async with listener:
+            await listener.serve_forever()
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def load_test(args) -> Dict:
+    from synthetic_corpus import generate_corpus
+    corpus = generate_corpus(args.distinct, args.size, args.mix, args.density, args.seed)
+    latencies = []
+    failures = 0
+    counter = iter(range(args.requests))
+
+    async def client(worker: int):
+        nonlocal failures
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix, limit=args.max_line)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port, limit=args.max_line)
+        try:
+            for n in counter:
+                text = corpus[n % len(corpus)]
+                t0 = time.perf_counter()
+                writer.write(json.dumps({'id': n, 'op': 'compress', 'text': text}).encode() + b"\n")
+                response = json.loads(await reader.readline())
+                if args.restore and 'error' not in response:
+                    response['op'] = 'restore'
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    response = json.loads(await reader.readline())
+                    if response.get('text') != text:
+                        failures += 1
+                latencies.append(time.perf_counter() - t0)
+                if 'error' in response:
+                    failures += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(worker) for worker in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total_bytes = sum(len(corpus[n % len(corpus)].encode()) for n in range(args.requests))
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'failures': failures,
+        'requests_per_s': args.requests / elapsed,
+        'mb_per_s': total_bytes / elapsed / 1e6,
+        'p50_ms': _percentile(latencies, 0.50) * 1e3,
+        'p90_ms': _percentile(latencies, 0.90) * 1e3,
+        'p99_ms': _percentile(latencies, 0.99) * 1e3,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Token Squeezer async compression service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_address(command):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", help="Unix socket path (overrides --host/--port)")
+        command.add_argument("--max-line", type=int, default=64 * 1024 * 1024, help="largest request/response line in bytes")
+
+    server = commands.add_parser("serve", help="run the JSON-lines compression server")
+    add_address(server)
+    server.add_argument("--workers", type=int, default=None)
+    server.add_argument("--executor", choices=["process", "thread"], default="process")
+    server.add_argument("--max-batch", type=int, default=32)
+    server.add_argument("--batch-window-ms", type=float, default=2.0)
+    server.add_argument("--max-queue", type=int, default=1024)
+    server.add_argument("--min-length", type=int, default=15)
+    server.add_argument("--safe", action="store_true")
+    server.add_argument("--dedupe", action="store_true")
+
+    load = commands.add_parser("load", help="load-test a running server")
+    add_address(load)
+    load.add_argument("--concurrency", type=int, default=32)
+    load.add_argument("--requests", type=int, default=2000)
+    load.add_argument("--size", type=int, default=2000, help="document size in characters")
+    load.add_argument("--distinct", type=int, default=200, help="distinct documents cycled through")
+    load.add_argument("--mix", default="mixed")
+    load.add_argument("--density", type=float, default=0.05)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--restore", action="store_true", help="round-trip every response through restore")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    report = asyncio.run(load_test(args))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from pattern_detector import PatternDetector
+from compression_engine import CompressionEngine
+from restoration_engine import RestorationEngine
+from token_analytics import TokenAnalytics
+from synthetic_corpus import MIXES, generate_corpus
+
+ENTITY_LINE = (
+    "see https://docs.example-platform.com/api/v2/reference/{i} and "
+    "/var/log/applications/service-{i}/production/output.log for details\n"
+)
+PROSE_LINE = "the quick brown fox jumps over the lazy dog while the build keeps running\n"
+
+def make_document(lines: int, entity_every: int = 1) -> str:
+    return "".join(
+        ENTITY_LINE.format(i=i) if i % entity_every == 0 else PROSE_LINE
+        for i in range(lines)
+    )
+
+def time_compress(engine: CompressionEngine, text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        engine.reset_counter()
+        start = time.perf_counter()
+        engine.compress(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_scaling(base_lines: int, steps: int, entity_every: int, repeat: int):
+    engine = CompressionEngine(PatternDetector(min_length=15))
+    print(f"{'lines':>9} {'bytes':>11} {'matches':>9} {'seconds':>9} {'MB/s':>8} {'x prev':>7}")
+    previous = None
+    for step in range(steps):
+        lines = base_lines * 2 ** step
+        text = make_document(lines, entity_every)
+        matches = len(engine.detector.detect_all(text))
+        seconds = time_compress(engine, text, repeat)
+        growth = f"{seconds / previous:.2f}" if previous else "-"
+        print(f"{lines:>9} {len(text):>11} {matches:>9} {seconds:>9.4f} "
+              f"{len(text) / seconds / 1e6:>8.2f} {growth:>7}")
+        previous = seconds
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(operation: Callable, inputs: List, total_bytes: int) -> Dict[str, float]:
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        t0 = time.perf_counter()
+        operation(item)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for item in inputs[:max(1, min(len(inputs), 20))]:
+        operation(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'mb_per_s': total_bytes / elapsed / 1e6 if elapsed else 0.0,
+        'docs_per_s': len(inputs) / elapsed if elapsed else 0.0,
+        'p50_ms': _percentile(latencies, 0.50) * 1e3,
+        'p99_ms': _percentile(latencies, 0.99) * 1e3,
+        'peak_mb': peak / 1e6,
+    }
+
+def run_suite(sizes: List[int], docs: int, mixes: List[str], density: float, seed: int) -> Dict:
+    detector = PatternDetector(min_length=15)
+    engine = CompressionEngine(detector)
+    records = []
+    for mix in mixes:
+        for size in sizes:
+            corpus = generate_corpus(docs, size, mix, density, seed)
+            total_bytes = sum(len(text.encode()) for text in corpus)
+            engine.reset_counter()
+            results = [engine.compress(text) for text in corpus]
+            analytics = TokenAnalytics(keep_history=False)
+            for result in results:
+                analytics.add_result(result)
+
+            operations = {
+                'detect_all': (detector.detect_all, corpus),
+                'compress': (engine.compress, corpus),
+                'restore': (lambda r: RestorationEngine.restore(r.compressed_text, r.placeholders), results),
+                'get_aggregate_stats': (lambda _: analytics.get_aggregate_stats(), results),
+            }
+            for name, (operation, inputs) in operations.items():
+                record = {'mix': mix, 'size': size, 'operation': name, 'docs': docs}
+                record.update(measure(operation, inputs, total_bytes))
+                records.append(record)
+                print(f"{mix:>11} {size:>8} {name:>20} {record['mb_per_s']:>9.2f} MB/s "
+                      f"{record['docs_per_s']:>10.1f} docs/s p50 {record['p50_ms']:>8.3f} ms "
+                      f"p99 {record['p99_ms']:>8.3f} ms peak {record['peak_mb']:>7.2f} MB")
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'entity_density': density,
+        'seed': seed,
+        'results': records,
+    }
+
+def find_regressions(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    previous = {(r['mix'], r['size'], r['operation']): r for r in baseline['results']}
+    regressions = []
+    for record in report['results']:
+        old = previous.get((record['mix'], record['size'], record['operation']))
+        if old is None or old['mb_per_s'] == 0:
+            continue
+        change = record['mb_per_s'] / old['mb_per_s'] - 1
+        if change < -max_regression:
+            regressions.append(
+                f"{record['mix']}/{record['size']}/{record['operation']}: "
+                f"{old['mb_per_s']:.2f} -> {record['mb_per_s']:.2f} MB/s ({change:+.1%})"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Token Squeezer benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scaling = commands.add_parser("scaling", help="compression time as document size and match count double")
+    scaling.add_argument("--base-lines", type=int, default=1000)
+    scaling.add_argument("--steps", type=int, default=6)
+    scaling.add_argument("--entity-every", type=int, default=1,
+                         help="emit an entity-bearing line every N lines")
+    scaling.add_argument("--repeat", type=int, default=3)
+
+    suite = commands.add_parser("suite", help="throughput, latency and memory on synthetic corpora")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    suite.add_argument("--docs", type=int, default=50)
+    suite.add_argument("--mixes", nargs="+", default=list(MIXES), choices=list(MIXES))
+    suite.add_argument("--density", type=float, default=0.05,
+                       help="probability that the next token is an entity")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", default="bench_results.json")
+    suite.add_argument("--baseline", help="previous results file to compare against")
+    suite.add_argument("--max-regression", type=float, default=0.2,
+                       help="allowed MB/s drop relative to the baseline")
+
+    args = parser.parse_args()
+    if args.command == "scaling":
+        run_scaling(args.base_lines, args.steps, args.entity_every, args.repeat)
+        return
+
+    report = run_suite(args.sizes, args.docs, args.mixes, args.density, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(report['results'])} measurements to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
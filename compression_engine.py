@@ -1,9 +1,39 @@
 import hashlib
+import os
 import re
-from dataclasses import dataclass, field
-from typing import Dict, List
-from collections import Counter
-from pattern_detector import PatternDetector, ContentType
+import time
+import zlib
+from array import array
+from collections.abc import Mapping as MappingABC
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple, Union
+from collections import Counter, OrderedDict
+from pattern_detector import PatternDetector, ContentType, CONTENT_TYPES, CONTENT_TYPE_CODES
+from tokenizer import Tokenizer, HeuristicTokenizer
+
+PLACEHOLDER_PATTERN = re.compile(r'@@P\d+@@')
+TAIL_BOUNDARY = re.compile(r'\S(?=\s)')
+INTEGRITY_MODES = ("none", "fast", "strong")
+Checksum = Union[str, int, None]
+
+def compute_checksum(content: str, integrity: str = "strong") -> Checksum:
+    # strong: first 8 hex digits of SHA-256; fast: CRC-32 as an int; none: no checksum.
+    # The type of a stored checksum tells which mode produced it.
+    if integrity == "strong":
+        return hashlib.sha256(content.encode()).hexdigest()[:8]
+    if integrity == "fast":
+        return zlib.crc32(content.encode())
+    return None
+
+def checksum_mode(checksum: Checksum) -> str:
+    if checksum is None:
+        return "none"
+    return "fast" if isinstance(checksum, int) else "strong"
+
+def _validate_integrity(integrity: str):
+    if integrity not in INTEGRITY_MODES:
+        raise ValueError(f"Unknown integrity mode: {integrity!r} (expected one of {', '.join(INTEGRITY_MODES)})")
 
 @dataclass
 class Placeholder:
@@ -12,62 +42,289 @@ class Placeholder:
     content_type: ContentType
     start_pos: int
     end_pos: int
-    checksum: str
+    checksum: Checksum
+
+class PlaceholderTable(MappingABC):
+    # Parallel arrays instead of one Placeholder per match. Originals are slices of a
+    # shared source: the document itself, or a string table of the originals only.
+    # Placeholder objects are built on access for callers expecting the dict form.
+    # Checksums of every mode fit the 32-bit column; `integrity` says how to read them.
+    def __init__(self, source: Optional[str] = None, integrity: str = "strong"):
+        _validate_integrity(integrity)
+        self.source = source
+        self.integrity = integrity
+        self.numbers = array('q')
+        self.starts = array('q')
+        self.types = array('B')
+        self.checksums = array('I')
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self._string_table = source is None
+        self._originals: List[str] = []
+        self._table_size = 0
+        self._base: Optional[int] = None
+        self._index: Optional[Dict[int, int]] = None
+
+    def add(self, number: int, start_pos: int, content_type: ContentType, checksum: Checksum, original: str, offset: int):
+        if checksum_mode(checksum) != self.integrity:
+            raise ValueError(f"A {checksum_mode(checksum)} checksum cannot be stored in a {self.integrity} placeholder table")
+        self.numbers.append(number)
+        self.starts.append(start_pos)
+        self.types.append(CONTENT_TYPE_CODES[content_type])
+        if self.integrity == "strong":
+            checksum = int(checksum, 16)
+        self.checksums.append(checksum or 0)
+        self.lengths.append(len(original))
+        if self._string_table:
+            self.offsets.append(self._table_size)
+            self._table_size += len(original)
+            self._originals.append(original)
+        else:
+            self.offsets.append(offset)
+
+    def freeze(self) -> "PlaceholderTable":
+        if self._string_table:
+            self.source = (self.source or "") + "".join(self._originals)
+            self._originals = []
+        numbers = self.numbers
+        self._index = None
+        self._base = None
+        if numbers and numbers == array('q', range(numbers[0], numbers[0] + len(numbers))):
+            self._base = numbers[0]
+        return self
+
+    def copy(self, source: Optional[str] = None) -> "PlaceholderTable":
+        # Unfrozen copy for further add()/remove() calls. A shared source can be swapped
+        # for a longer text with the same prefix, e.g. the document after an append.
+        if not self._string_table and source is None:
+            table = PlaceholderTable(integrity=self.integrity)
+            for placeholder in self.values():
+                table.add(int(placeholder.id[3:-2]), placeholder.start_pos, placeholder.content_type,
+                          placeholder.checksum, placeholder.original, 0)
+            return table
+        table = PlaceholderTable(None if self._string_table else source, self.integrity)
+        if self._string_table:
+            table.source = self.source
+            table._table_size = len(self.source)
+        for name in ("numbers", "starts", "types", "checksums", "offsets", "lengths"):
+            column = getattr(self, name)
+            setattr(table, name, array(column.typecode, column))
+        return table
+
+    def remove(self, placeholder_id: str):
+        row = self._row(placeholder_id)
+        if row is None:
+            raise KeyError(placeholder_id)
+        for column in (self.numbers, self.starts, self.types, self.checksums, self.offsets, self.lengths):
+            del column[row]
+        self._base = None
+        self._index = None
+
+    def move(self, placeholder_id: str, start_pos: int):
+        row = self._row(placeholder_id)
+        if row is None:
+            raise KeyError(placeholder_id)
+        self.starts[row] = start_pos
+
+    def _row(self, placeholder_id: str) -> Optional[int]:
+        digits = placeholder_id[3:-2]
+        if not (placeholder_id.startswith("@@P") and placeholder_id.endswith("@@") and digits.isdigit()):
+            return None
+        number = int(digits)
+        if self._base is not None:
+            row = number - self._base
+            return row if 0 <= row < len(self.numbers) else None
+        if self._index is None:
+            self._index = {n: row for row, n in enumerate(self.numbers)}
+        return self._index.get(number)
+
+    def _view(self, row: int) -> Placeholder:
+        placeholder_id = f"@@P{self.numbers[row]}@@"
+        offset = self.offsets[row]
+        checksum = self.checksums[row]
+        if self.integrity == "strong":
+            checksum = f"{checksum:08x}"
+        elif self.integrity == "none":
+            checksum = None
+        return Placeholder(
+            id=placeholder_id,
+            original=self.source[offset:offset + self.lengths[row]],
+            content_type=CONTENT_TYPES[self.types[row]],
+            start_pos=self.starts[row],
+            end_pos=self.starts[row] + len(placeholder_id),
+            checksum=checksum
+        )
+
+    def __getitem__(self, placeholder_id: str) -> Placeholder:
+        row = self._row(placeholder_id)
+        if row is None:
+            raise KeyError(placeholder_id)
+        return self._view(row)
+
+    def __contains__(self, placeholder_id) -> bool:
+        return isinstance(placeholder_id, str) and self._row(placeholder_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (f"@@P{number}@@" for number in self.numbers)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def values(self) -> Iterator[Placeholder]:
+        return (self._view(row) for row in range(len(self.numbers)))
+
+    def items(self) -> Iterator[Tuple[str, Placeholder]]:
+        return ((placeholder.id, placeholder) for placeholder in self.values())
 
 @dataclass
 class CompressionResult:
-    original_text: str
+    original_text: Optional[str]
     compressed_text: str
-    placeholders: Dict[str, Placeholder]
+    placeholders: Mapping[str, Placeholder]
     original_tokens: int
     compressed_tokens: int
     savings_ratio: float
     content_type_counts: Dict[ContentType, int] = field(default_factory=dict)
 
+@dataclass
+class CodebookEntry:
+    id: str
+    original: str
+    content_type: ContentType
+    checksum: Checksum
+    digest: str
+    refcount: int = 0
+
+class PlaceholderCodebook:
+    def __init__(self, max_entries: Optional[int] = None, integrity: str = "strong"):
+        _validate_integrity(integrity)
+        self.max_entries = max_entries
+        self.integrity = integrity
+        self.next_id = 0
+        self.evictions = 0
+        self._entries: Dict[str, CodebookEntry] = {}
+        self._ids_by_digest: Dict[str, str] = {}
+        self._unreferenced: "OrderedDict[str, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, placeholder_id: str) -> bool:
+        return placeholder_id in self._entries
+
+    def get(self, placeholder_id: str, default=None) -> Optional[CodebookEntry]:
+        return self._entries.get(placeholder_id, default)
+
+    def acquire(self, content: str, content_type: ContentType) -> CodebookEntry:
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        placeholder_id = self._ids_by_digest.get(digest)
+        if placeholder_id is None:
+            placeholder_id = f"@@P{self.next_id}@@"
+            self.next_id += 1
+            checksum = digest[:8] if self.integrity == "strong" else compute_checksum(content, self.integrity)
+            entry = CodebookEntry(placeholder_id, content, content_type, checksum, digest)
+            self._entries[placeholder_id] = entry
+            self._ids_by_digest[digest] = placeholder_id
+        else:
+            entry = self._entries[placeholder_id]
+            self._unreferenced.pop(placeholder_id, None)
+        entry.refcount += 1
+        return entry
+
+    def release(self, result: "CompressionResult"):
+        for placeholder_id in result.placeholders:
+            entry = self._entries.get(placeholder_id)
+            if entry is None or entry.refcount == 0:
+                continue
+            entry.refcount -= 1
+            if entry.refcount == 0:
+                self._unreferenced[placeholder_id] = None
+        self._evict()
+
+    def _evict(self):
+        # Only entries no live result refers to are evictable, oldest release first.
+        if self.max_entries is None:
+            return
+        while len(self._entries) > self.max_entries and self._unreferenced:
+            placeholder_id, _ = self._unreferenced.popitem(last=False)
+            entry = self._entries.pop(placeholder_id)
+            del self._ids_by_digest[entry.digest]
+            self.evictions += 1
+
 class CompressionEngine:
-    def __init__(self, detector: PatternDetector):
+    def __init__(
+        self,
+        detector: PatternDetector,
+        dedupe: bool = False,
+        codebook: Optional[PlaceholderCodebook] = None,
+        tokenizer: Optional[Tokenizer] = None,
+        compact: bool = False,
+        keep_original_text: bool = True,
+        cache=None,
+        sink=None,
+        integrity: Optional[str] = None
+    ):
+        # integrity defaults to the codebook's mode, or "strong" without a codebook.
+        if integrity is None:
+            integrity = codebook.integrity if codebook is not None else "strong"
+        _validate_integrity(integrity)
+        if codebook is not None and codebook.integrity != integrity:
+            raise ValueError(f"Engine integrity {integrity!r} does not match the codebook's {codebook.integrity!r}")
+        self.integrity = integrity
         self.detector = detector
         self.placeholder_counter = 0
+        self.codebook = codebook
+        self.dedupe = dedupe or codebook is not None
+        self.tokenizer = tokenizer or HeuristicTokenizer()
+        self.compact = compact
+        self.keep_original_text = keep_original_text
+        self.cache = cache
+        self.sink = sink
+        self.documents_compressed = 0
 
-    def compress(self, text: str) -> CompressionResult:
-        matches = self.detector.detect_all(text)
-        placeholders = {}
-        compressed_text = text
-        offset = 0
-        content_type_counts = Counter()
-
-        for content_type, start, end, content in matches:
-            placeholder_id = f"@@P{self.placeholder_counter}@@"
-            self.placeholder_counter += 1
-            checksum = hashlib.sha256(content.encode()).hexdigest()[:8]
-
-            placeholder = Placeholder(
-                id=placeholder_id,
-                original=content,
-                content_type=content_type,
-                start_pos=start - offset,
-                end_pos=start - offset + len(placeholder_id),
-                checksum=checksum
-            )
-
-            placeholders[placeholder_id] = placeholder
-            content_type_counts[content_type] += 1
+    def compress(self, text: str, target_tokens: Optional[int] = None, original_tokens: Optional[int] = None) -> CompressionResult:
+        # original_tokens: the text's count if already known, e.g. from tokenizer.count_batch.
+        started = time.perf_counter()
+        # Codebook IDs are shared across documents, so cached results could not be rebased.
+        if target_tokens is not None or original_tokens is not None:
+            result = self._compress(text, target_tokens, original_tokens)
+        elif self.cache is not None and self.codebook is None:
+            result = self.cache.compress(self, text)
+        else:
+            result = self._compress(text)
+        self.documents_compressed += 1
+        if self.sink is not None:
+            elapsed = time.perf_counter() - started
+            self.sink.increment("compress_documents_total")
+            self.sink.increment("compress_chars_total", len(text))
+            self.sink.increment("compress_seconds_total", elapsed)
+            self.sink.increment("compress_placeholders_total", len(result.placeholders))
+            self.sink.observe_document("compress", self.documents_compressed - 1, elapsed, len(text))
+        return result
 
-            adjusted_start = start - offset
-            adjusted_end = end - offset
-            compressed_text = (
-                compressed_text[:adjusted_start] +
-                placeholder_id +
-                compressed_text[adjusted_end:]
-            )
-            offset += (end - start) - len(placeholder_id)
+    def _compress(self, text: str, target_tokens: Optional[int] = None, original_tokens: Optional[int] = None) -> CompressionResult:
+        started = time.perf_counter()
+        matches = self.detector.detect_all(text)
+        detected = time.perf_counter()
+        if original_tokens is None:
+            original_tokens = self._estimate_tokens(text)
+        counted = time.perf_counter()
+        if target_tokens is not None:
+            matches = self._select_for_budget(matches, original_tokens, target_tokens)
+        compressed_text, placeholders, content_type_counts = self._replace_matches(text, matches)
+        replaced = time.perf_counter()
 
-        original_tokens = self._estimate_tokens(text)
-        compressed_tokens = self._estimate_tokens(compressed_text)
+        compressed_tokens = self.tokenizer.count_compressed(
+            compressed_text, text, original_tokens, [(start, end) for _, start, end, _ in matches]
+        )
         savings_ratio = 1 - (compressed_tokens / original_tokens) if original_tokens > 0 else 0
+        if self.sink is not None:
+            self.sink.increment("compress_detect_seconds_total", detected - started)
+            self.sink.increment("compress_replace_seconds_total", replaced - counted)
+            self.sink.increment("compress_token_seconds_total", counted - detected + time.perf_counter() - replaced)
 
         return CompressionResult(
-            original_text=text,
+            original_text=text if self.keep_original_text else None,
             compressed_text=compressed_text,
             placeholders=placeholders,
             original_tokens=original_tokens,
@@ -76,8 +333,385 @@ class CompressionEngine:
             content_type_counts=dict(content_type_counts)
         )
 
+    def compress_batch(
+        self,
+        texts: Iterable[str],
+        workers: Optional[int] = None,
+        executor: str = "process",
+        chunksize: Optional[int] = None
+    ) -> List[CompressionResult]:
+        # Every document gets its own placeholder namespace starting at @@P0@@, so IDs do
+        # not depend on scheduling and the engine's own counter is left untouched.
+        if self.codebook is not None:
+            raise ValueError("compress_batch uses per-document placeholder namespaces and cannot share a codebook")
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown executor: {executor!r}")
+        texts = list(texts)
+        workers = workers or os.cpu_count() or 1
+        if chunksize is None:
+            chunksize = max(1, -(-len(texts) // (workers * 4)))
+        chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+
+        if workers == 1 or len(chunks) <= 1:
+            return _compress_documents(self._worker_engine(), texts)
+
+        # Imported here: concurrent.futures pulls in logging and multiprocessing, which
+        # would otherwise dominate the start-up time of the CLI's compress/restore path.
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        results = []
+        with pool_class(max_workers=workers) as pool:
+            engines = [self._worker_engine() for _ in chunks]
+            for chunk_results in pool.map(_compress_documents, engines, chunks):
+                results.extend(chunk_results)
+        return results
+
+    def compress_corpus(self, texts: Iterable[str]) -> List[CompressionResult]:
+        # Same results as compress_batch(texts, workers=1), built in bulk for many short
+        # documents: one detect_corpus scan, one count_batch call, and per-document
+        # namespaces starting at @@P0@@. The cache is not consulted.
+        if self.codebook is not None:
+            raise ValueError("compress_corpus uses per-document placeholder namespaces and cannot share a codebook")
+        started = time.perf_counter()
+        texts = list(texts)
+        detected = self.detector.detect_corpus(texts)
+        original_counts = self.tokenizer.count_batch(texts)
+
+        counter = self.placeholder_counter
+        results = []
+        for text, matches, original_tokens in zip(texts, detected, original_counts):
+            self.placeholder_counter = 0
+            compressed_text, placeholders, content_type_counts = self._replace_matches(text, matches)
+            compressed_tokens = self.tokenizer.count_compressed(
+                compressed_text, text, original_tokens, [(start, end) for _, start, end, _ in matches]
+            )
+            results.append(CompressionResult(
+                original_text=text if self.keep_original_text else None,
+                compressed_text=compressed_text,
+                placeholders=placeholders,
+                original_tokens=original_tokens,
+                compressed_tokens=compressed_tokens,
+                savings_ratio=1 - (compressed_tokens / original_tokens) if original_tokens > 0 else 0,
+                content_type_counts=dict(content_type_counts)
+            ))
+        self.placeholder_counter = counter
+        self.documents_compressed += len(texts)
+
+        if self.sink is not None:
+            self.sink.increment("compress_documents_total", len(texts))
+            self.sink.increment("compress_chars_total", sum(len(text) for text in texts))
+            self.sink.increment("compress_seconds_total", time.perf_counter() - started)
+            self.sink.increment("compress_placeholders_total", sum(len(result.placeholders) for result in results))
+        return results
+
+    def _worker_engine(self) -> "CompressionEngine":
+        return CompressionEngine(
+            self.detector,
+            dedupe=self.dedupe,
+            tokenizer=self.tokenizer,
+            compact=self.compact,
+            keep_original_text=self.keep_original_text,
+            cache=self.cache,
+            sink=self.sink,
+            integrity=self.integrity
+        )
+
+    def compress_stream(
+        self,
+        chunks: Union[Iterable[str], TextIO],
+        max_entity_size: int = 4096,
+        chunk_size: int = 65536
+    ) -> Iterator[Tuple[str, Mapping[str, Placeholder]]]:
+        # Each entity up to max_entity_size is seen whole, but scanning restarts at every
+        # cut, so quotes and backticks can pair differently than in one scan of the whole
+        # text: QUOTED and INLINE_CODE matches (and the entities they overlap) may differ
+        # from compress(). The restored text is always exact.
+        if max_entity_size < 1:
+            raise ValueError("max_entity_size must be at least 1")
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        elif hasattr(chunks, "read"):
+            chunks = iter(partial(chunks.read, chunk_size), "")
+
+        buffer = ""
+        pos = 0
+        position = 0
+        for chunk in chunks:
+            buffer += chunk
+            if len(buffer) - pos < 2 * max_entity_size:
+                continue
+            # Matches starting before the cut are final for entities up to max_entity_size;
+            # everything after the last emitted match is rescanned with the next chunk.
+            cut = len(buffer) - max_entity_size
+            matches = [m for m in self.detector.detect_all(buffer, pos) if m[1] < cut]
+            boundary = max(cut, matches[-1][2]) if matches else cut
+            compressed, placeholders, _ = self._replace_matches(buffer, matches, pos, boundary, position)
+            position += len(compressed)
+            yield compressed, placeholders
+            # Keep one character before the boundary so \b assertions see real context.
+            buffer = buffer[boundary - 1:]
+            pos = 1
+
+        if len(buffer) > pos:
+            matches = self.detector.detect_all(buffer, pos)
+            compressed, placeholders, _ = self._replace_matches(buffer, matches, pos, None, position)
+            yield compressed, placeholders
+
+    def compress_incremental(
+        self,
+        previous: CompressionResult,
+        appended_text: str,
+        max_entity_size: int = 4096
+    ) -> CompressionResult:
+        # Only the compressed tail (at least max_entity_size characters) is restored and
+        # rescanned together with the appended text. The tail starts just before a
+        # whitespace run, so it holds no partial placeholder and both built-in tokenizers
+        # split the text there exactly as they would the whole, which makes token and
+        # type counts exact deltas.
+        if self.codebook is not None:
+            raise ValueError("compress_incremental does not support a shared codebook")
+        if max_entity_size < 1:
+            raise ValueError("max_entity_size must be at least 1")
+        compressed = previous.compressed_text
+        placeholders = previous.placeholders
+        start = self._tail_start(compressed, max_entity_size)
+
+        old_tail = []
+        old_tail_ids = []
+        last_end = start
+        for match in PLACEHOLDER_PATTERN.finditer(compressed, start):
+            placeholder = placeholders.get(match.group())
+            if placeholder is None:
+                continue
+            old_tail.append(compressed[last_end:match.start()])
+            old_tail.append(placeholder.original)
+            old_tail_ids.append(placeholder)
+            last_end = match.end()
+        old_tail.append(compressed[last_end:])
+        old_tail_text = "".join(old_tail)
+        tail_text = old_tail_text + appended_text
+
+        context = ""
+        if start > 0:
+            context = compressed[start - 1]
+            before = PLACEHOLDER_PATTERN.search(compressed, max(0, start - 32), start)
+            if before is not None and before.end() == start and before.group() in placeholders:
+                context = placeholders[before.group()].original[-1]
+        scan_text = context + tail_text
+        matches = self.detector.detect_all(scan_text, len(context))
+
+        original_text = None
+        if previous.original_text is not None and self.keep_original_text:
+            original_text = previous.original_text + appended_text
+        if isinstance(placeholders, PlaceholderTable):
+            updated = placeholders.copy(original_text)
+            tail_offset = (len(original_text) - len(tail_text) - len(context)) if original_text is not None else 0
+        else:
+            updated = dict(placeholders)
+            tail_offset = 0
+
+        # New IDs continue after the highest one in use: previous may come from another
+        # engine, compress_batch/compress_corpus or a reset counter, all numbering from 0.
+        if isinstance(placeholders, PlaceholderTable):
+            numbers = placeholders.numbers
+        else:
+            numbers = [int(placeholder_id[3:-2]) for placeholder_id in placeholders]
+        self.placeholder_counter = max(self.placeholder_counter, max(numbers, default=-1) + 1)
+
+        content_type_counts = Counter(previous.content_type_counts)
+        reusable: Dict[str, List[Placeholder]] = {}
+        for placeholder in reversed(old_tail_ids):
+            content_type_counts[placeholder.content_type] -= 1
+            reusable.setdefault(placeholder.original, []).append(placeholder)
+        stale = {placeholder.id for placeholder in old_tail_ids}
+
+        segments = []
+        position = start
+        last_end = len(context)
+        seen: Dict[str, str] = {}
+        for content_type, match_start, match_end, content in matches:
+            segments.append(scan_text[last_end:match_start])
+            position += match_start - last_end
+            last_end = match_end
+            content_type_counts[content_type] += 1
+
+            placeholder_id = seen.get(content)
+            if placeholder_id is None:
+                candidates = reusable.get(content)
+                if candidates:
+                    placeholder = candidates.pop()
+                    placeholder_id = placeholder.id
+                    stale.discard(placeholder_id)
+                    if placeholder.start_pos >= start and placeholder.start_pos != position:
+                        if isinstance(updated, PlaceholderTable):
+                            updated.move(placeholder_id, position)
+                        else:
+                            updated[placeholder_id] = replace(
+                                placeholder, start_pos=position, end_pos=position + len(placeholder_id)
+                            )
+                else:
+                    number = self.placeholder_counter
+                    placeholder_id = f"@@P{number}@@"
+                    self.placeholder_counter += 1
+                    checksum = self._checksum(content)
+                    if isinstance(updated, PlaceholderTable):
+                        updated.add(number, position, content_type, checksum, content, tail_offset + match_start)
+                    else:
+                        updated[placeholder_id] = Placeholder(
+                            id=placeholder_id,
+                            original=content,
+                            content_type=content_type,
+                            start_pos=position,
+                            end_pos=position + len(placeholder_id),
+                            checksum=checksum
+                        )
+                if self.dedupe:
+                    seen[content] = placeholder_id
+
+            segments.append(placeholder_id)
+            position += len(placeholder_id)
+        segments.append(scan_text[last_end:])
+        new_tail = "".join(segments)
+
+        for placeholder_id in stale:
+            # With dedupe an ID may also occur before the window; keep it then.
+            if placeholders[placeholder_id].start_pos >= start:
+                if isinstance(updated, PlaceholderTable):
+                    updated.remove(placeholder_id)
+                else:
+                    del updated[placeholder_id]
+        if isinstance(updated, PlaceholderTable):
+            updated.freeze()
+
+        original_tokens = previous.original_tokens - self._estimate_tokens(old_tail_text) + self._estimate_tokens(tail_text)
+        compressed_tokens = (
+            previous.compressed_tokens - self._estimate_tokens(compressed[start:]) + self._estimate_tokens(new_tail)
+        )
+        return CompressionResult(
+            original_text=original_text,
+            compressed_text=compressed[:start] + new_tail,
+            placeholders=updated,
+            original_tokens=original_tokens,
+            compressed_tokens=compressed_tokens,
+            savings_ratio=1 - (compressed_tokens / original_tokens) if original_tokens > 0 else 0,
+            content_type_counts={ctype: n for ctype, n in content_type_counts.items() if n > 0}
+        )
+
+    @staticmethod
+    def _tail_start(compressed_text: str, max_entity_size: int) -> int:
+        target = len(compressed_text) - max_entity_size
+        if target <= 0:
+            return 0
+        start = 0
+        for match in TAIL_BOUNDARY.finditer(compressed_text, max(0, target - max_entity_size), target):
+            start = match.end()
+        return start
+
+    def _replace_matches(
+        self,
+        text: str,
+        matches: List[Tuple[ContentType, int, int, str]],
+        start: int = 0,
+        end: Optional[int] = None,
+        position: int = 0
+    ) -> Tuple[str, Mapping[str, Placeholder], Counter]:
+        table = None
+        if self.compact:
+            shares_text = self.keep_original_text and start == 0 and end is None
+            table = PlaceholderTable(text if shares_text else None, self.integrity)
+        placeholders = {} if table is None else table
+        segments = []
+        last_end = start
+        content_type_counts = Counter()
+        seen: Dict[str, str] = {}
+
+        for content_type, match_start, match_end, content in matches:
+            segments.append(text[last_end:match_start])
+            position += match_start - last_end
+            last_end = match_end
+            content_type_counts[content_type] += 1
+
+            placeholder_id = seen.get(content) if self.dedupe else None
+            if placeholder_id is None:
+                if self.codebook is not None:
+                    entry = self.codebook.acquire(content, content_type)
+                    placeholder_id, content, checksum = entry.id, entry.original, entry.checksum
+                    number = int(placeholder_id[3:-2])
+                else:
+                    number = self.placeholder_counter
+                    placeholder_id = f"@@P{number}@@"
+                    self.placeholder_counter += 1
+                    checksum = self._checksum(content)
+
+                if table is not None:
+                    table.add(number, position, content_type, checksum, content, match_start)
+                else:
+                    placeholders[placeholder_id] = Placeholder(
+                        id=placeholder_id,
+                        original=content,
+                        content_type=content_type,
+                        start_pos=position,
+                        end_pos=position + len(placeholder_id),
+                        checksum=checksum
+                    )
+                if self.dedupe:
+                    seen[content] = placeholder_id
+
+            segments.append(placeholder_id)
+            position += len(placeholder_id)
+
+        segments.append(text[last_end:end])
+        if table is not None:
+            table.freeze()
+        return "".join(segments), placeholders, content_type_counts
+
+    def _select_for_budget(
+        self,
+        matches: List[Tuple[ContentType, int, int, str]],
+        original_tokens: int,
+        target_tokens: int
+    ) -> List[Tuple[ContentType, int, int, str]]:
+        # Estimated savings of a match are its tokens minus those of a placeholder (priced at
+        # the largest ID this document can use). The fewest net-positive replacements that
+        # reach the target are the largest savings first; they go back in document order.
+        placeholder_cost = self._estimate_tokens(f"@@P{self.placeholder_counter + len(matches)}@@")
+        scored = []
+        entity_tokens = self.tokenizer.count_batch([content for _, _, _, content in matches])
+        for index, tokens in enumerate(entity_tokens):
+            savings = tokens - placeholder_cost
+            if savings > 0:
+                scored.append((-savings, index))
+        scored.sort()
+
+        excess = original_tokens - target_tokens
+        selected = []
+        for negative_savings, index in scored:
+            if excess <= 0:
+                break
+            selected.append(index)
+            excess += negative_savings
+        selected.sort()
+        return [matches[index] for index in selected]
+
+    def _checksum(self, content: str) -> Checksum:
+        if self.sink is None:
+            return compute_checksum(content, self.integrity)
+        started = time.perf_counter()
+        checksum = compute_checksum(content, self.integrity)
+        self.sink.increment("compress_hash_seconds_total", time.perf_counter() - started)
+        return checksum
+
     def _estimate_tokens(self, text: str) -> int:
-        return len(text.split()) + len(re.findall(r'[^\w\s]', text))
+        return self.tokenizer.count(text)
 
     def reset_counter(self):
-        self.placeholder_counter = 0
\ No newline at end of file
+        self.placeholder_counter = 0
+
+def _compress_documents(engine: CompressionEngine, texts: List[str]) -> List[CompressionResult]:
+    results = []
+    # Cached documents are never counted, so only count the batch up front without a cache.
+    counts = engine.tokenizer.count_batch(texts) if engine.cache is None else [None] * len(texts)
+    for text, original_tokens in zip(texts, counts):
+        engine.reset_counter()
+        results.append(engine.compress(text, original_tokens=original_tokens))
+    return results
\ No newline at end of file
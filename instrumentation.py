@@ -0,0 +1,107 @@
+import heapq
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from pattern_detector import ContentType
+
+# Instrumented components hold a `sink` attribute that is None by default; every hook is
+# guarded by a single `is not None` check, so a disabled sink costs one attribute test per
+# call. Counters are named in Prometheus style and optionally labelled with a content type.
+
+class MetricsSink:
+    def increment(self, name: str, value: float = 1, content_type: Optional[ContentType] = None):
+        raise NotImplementedError
+
+    def observe_document(self, stage: str, document: int, seconds: float, length: int):
+        raise NotImplementedError
+
+class InMemorySink(MetricsSink):
+    def __init__(self, slowest: int = 10):
+        self.counters: Dict[Tuple[str, Optional[ContentType]], float] = defaultdict(float)
+        self.slowest = slowest
+        self._slowest: Dict[str, List[Tuple[float, int, int]]] = defaultdict(list)
+
+    def increment(self, name: str, value: float = 1, content_type: Optional[ContentType] = None):
+        self.counters[(name, content_type)] += value
+
+    def observe_document(self, stage: str, document: int, seconds: float, length: int):
+        heap = self._slowest[stage]
+        if len(heap) < self.slowest:
+            heapq.heappush(heap, (seconds, document, length))
+        elif seconds > heap[0][0]:
+            heapq.heapreplace(heap, (seconds, document, length))
+
+    def get(self, name: str, content_type: Optional[ContentType] = None) -> float:
+        return self.counters.get((name, content_type), 0.0)
+
+    def by_content_type(self, name: str) -> Dict[ContentType, float]:
+        return {ctype: value for (metric, ctype), value in self.counters.items() if metric == name and ctype is not None}
+
+    def slowest_documents(self, stage: str) -> List[Dict]:
+        return [
+            {'document': document, 'seconds': seconds, 'length': length}
+            for seconds, document, length in sorted(self._slowest.get(stage, []), reverse=True)
+        ]
+
+    def snapshot(self) -> Dict:
+        counters = defaultdict(dict)
+        for (name, ctype), value in sorted(self.counters.items(), key=lambda item: (item[0][0], item[0][1].value if item[0][1] else "")):
+            counters[name][ctype.value if ctype is not None else "all"] = value
+        return {
+            'counters': dict(counters),
+            'slowest_documents': {stage: self.slowest_documents(stage) for stage in self._slowest},
+        }
+
+    def reset(self):
+        self.counters.clear()
+        self._slowest.clear()
+
+class _PeriodicFileSink(InMemorySink):
+    # Rewrites its file at most every `interval` seconds, checked when a document is
+    # observed, and on flush(). Writes go through a temporary file and os.replace so
+    # readers never see a partial file.
+    def __init__(self, path: str, interval: float = 10.0, slowest: int = 10):
+        super().__init__(slowest)
+        self.path = path
+        self.interval = interval
+        self._last_write = time.monotonic()
+
+    def observe_document(self, stage: str, document: int, seconds: float, length: int):
+        super().observe_document(stage, document, seconds, length)
+        if time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+
+    def flush(self):
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+        self._last_write = time.monotonic()
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+class JsonFileSink(_PeriodicFileSink):
+    def render(self) -> str:
+        return json.dumps({'timestamp': time.time(), **self.snapshot()}, indent=2)
+
+class PrometheusFileSink(_PeriodicFileSink):
+    # Text exposition format, e.g. for node_exporter's textfile collector.
+    def __init__(self, path: str, interval: float = 10.0, prefix: str = "token_squeezer_", slowest: int = 10):
+        super().__init__(path, interval, slowest)
+        self.prefix = prefix
+
+    def render(self) -> str:
+        lines = []
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            metric = self.prefix + name
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, ctype), value in sorted(self.counters.items(), key=lambda item: item[0][1].value if item[0][1] else ""):
+                if counter != name:
+                    continue
+                labels = f'{{content_type="{ctype.value}"}}' if ctype is not None else ""
+                lines.append(f"{metric}{labels} {value!r}")
+        return "\n".join(lines) + "\n"
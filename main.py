@@ -0,0 +1,164 @@
+import argparse
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+from pattern_detector import PatternDetector
+from compression_engine import CompressionEngine
+from restoration_engine import RestorationEngine
+from result_format import RESULT_FIELDS, result_to_record, record_to_result
+from token_analytics import TokenAnalytics
+
+# Keep this module's imports stdlib-only: compress and restore run in short-lived workers,
+# so NumPy (metrics store) and matplotlib (demo) are imported only by the commands using them.
+
+def _open_inputs(paths: List[str]) -> Iterator[Tuple[str, TextIO]]:
+    if not paths or paths == ["-"]:
+        yield "-", sys.stdin
+        return
+    for path in paths:
+        if path == "-":
+            yield path, sys.stdin
+            continue
+        with open(path, encoding="utf-8") as f:
+            yield path, f
+
+def read_records(paths: List[str]) -> Iterator[Dict]:
+    for _, f in _open_inputs(paths):
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_documents(paths: List[str], jsonl: bool, field: str) -> Iterator[Tuple[Dict, str]]:
+    if jsonl:
+        for record in read_records(paths):
+            text = record.pop(field)
+            yield record, text
+        return
+    for path, f in _open_inputs(paths):
+        yield {'source': path}, f.read()
+
+def write_records(records: Iterable[Dict], output: TextIO):
+    for record in records:
+        output.write(json.dumps(record, ensure_ascii=False))
+        output.write("\n")
+
+def cmd_compress(args) -> int:
+    detector = PatternDetector(min_length=args.min_length, safe=args.safe)
+    engine = CompressionEngine(detector, dedupe=args.dedupe, integrity=args.integrity)
+
+    def records():
+        for meta, text in read_documents(args.inputs, args.jsonl, args.field):
+            engine.reset_counter()
+            meta.update(result_to_record(engine.compress(text, target_tokens=args.target_tokens)))
+            yield meta
+
+    write_records(records(), args.output)
+    return 0
+
+def cmd_restore(args) -> int:
+    status = 0
+    for record in read_records(args.inputs):
+        result = record_to_result(record)
+        restored, integrity, errors = RestorationEngine.restore(result.compressed_text, result.placeholders, args.integrity)
+        if not integrity:
+            status = 1
+        if args.text:
+            args.output.write(restored)
+            continue
+        out = {k: v for k, v in record.items() if k not in RESULT_FIELDS}
+        out.update({args.field: restored, 'integrity': integrity, 'errors': errors})
+        write_records([out], args.output)
+    return status
+
+def cmd_stats(args) -> int:
+    metrics_store = None
+    if args.metrics_out:
+        from metrics_store import MetricsStore
+        metrics_store = MetricsStore()
+    analytics = TokenAnalytics(args.cost_per_1k, keep_history=False, metrics_store=metrics_store)
+    for record in read_records(args.inputs):
+        analytics.add_result(record_to_result(record))
+
+    stats = analytics.get_aggregate_stats()
+    if stats:
+        stats['content_type_counts'] = {ctype.value: n for ctype, n in stats['content_type_counts'].items()}
+    json.dump(stats, args.output, indent=2)
+    args.output.write("\n")
+    if metrics_store is not None:
+        metrics_store.save(args.metrics_out)
+    return 0
+
+def cmd_report(args) -> int:
+    from metrics_store import MetricsStore
+    import reporting
+    if len(args.inputs) == 1 and args.inputs[0].endswith(".npy"):
+        metrics_store = MetricsStore.open(args.inputs[0])
+    else:
+        metrics_store = MetricsStore()
+        analytics = TokenAnalytics(args.cost_per_1k, keep_history=False, metrics_store=metrics_store)
+        for record in read_records(args.inputs):
+            analytics.add_result(record_to_result(record))
+    if len(metrics_store) == 0:
+        print("No records to report", file=sys.stderr)
+        return 1
+    reporting.render_report(metrics_store, args.out, dpi=args.dpi, bins=args.bins, max_points=args.max_points)
+    return 0
+
+def cmd_demo(args) -> int:
+    import visualizations
+    visualizations.main()
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="token-squeezer", description="Pattern-based text compression for LLM prompts")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_io(command, inputs_help):
+        command.add_argument("inputs", nargs="*", help=f"{inputs_help} (default: stdin)")
+        command.add_argument("-o", "--output", type=argparse.FileType("w", encoding="utf-8"), default=sys.stdout)
+
+    compress = commands.add_parser("compress", help="compress documents into JSONL records")
+    add_io(compress, "text files, one document each, or JSONL with --jsonl")
+    compress.add_argument("--jsonl", action="store_true", help="read one JSON object per line instead of whole files")
+    compress.add_argument("--field", default="text", help="JSONL field holding the document text")
+    compress.add_argument("--min-length", type=int, default=15)
+    compress.add_argument("--safe", action="store_true", help="use bounded, backtracking-safe patterns")
+    compress.add_argument("--dedupe", action="store_true", help="reuse one placeholder per distinct entity")
+    compress.add_argument("--integrity", choices=["none", "fast", "strong"], default="strong",
+                          help="placeholder checksums: none, CRC-32, or truncated SHA-256")
+    compress.add_argument("--target-tokens", type=int, default=None, help="replace only as many net-saving entities as needed to fit this many tokens")
+    compress.set_defaults(handler=cmd_compress)
+
+    restore = commands.add_parser("restore", help="restore compressed JSONL records")
+    add_io(restore, "JSONL produced by compress")
+    restore.add_argument("--field", default="text", help="field to write the restored text to")
+    restore.add_argument("--text", action="store_true", help="write restored text only, no JSON")
+    restore.add_argument("--integrity", choices=["none", "fast", "strong"], default=None,
+                         help="skip checksums (none) or require at least this checksum strength")
+    restore.set_defaults(handler=cmd_restore)
+
+    stats = commands.add_parser("stats", help="aggregate token and cost savings of compressed JSONL records")
+    add_io(stats, "JSONL produced by compress")
+    stats.add_argument("--cost-per-1k", type=float, default=TokenAnalytics.GPT4_INPUT_COST_PER_1K)
+    stats.add_argument("--metrics-out", help="also save per-document metrics to this .npy file (needs NumPy)")
+    stats.set_defaults(handler=cmd_stats)
+
+    report = commands.add_parser("report", help="render headless PNG/SVG report figures (needs matplotlib)")
+    report.add_argument("inputs", nargs="*", help="JSONL produced by compress, or one .npy file from stats --metrics-out (default: stdin)")
+    report.add_argument("--out", action="append", required=True, help="output image; format from the extension, repeatable")
+    report.add_argument("--cost-per-1k", type=float, default=TokenAnalytics.GPT4_INPUT_COST_PER_1K)
+    report.add_argument("--bins", type=int, default=100, help="histogram bins for the ratio distribution")
+    report.add_argument("--max-points", type=int, default=5000, help="most points drawn per line or scatter")
+    report.add_argument("--dpi", type=int, default=150)
+    report.set_defaults(handler=cmd_report)
+
+    demo = commands.add_parser("demo", help="run the visualization demo (needs matplotlib, seaborn, SciPy)")
+    demo.set_defaults(handler=cmd_demo)
+    return parser
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
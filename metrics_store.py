@@ -0,0 +1,93 @@
+import numpy as np
+from typing import Dict, List, Optional
+from pattern_detector import ContentType
+from compression_engine import CompressionResult
+
+COUNT_FIELDS = {ctype: f"count_{ctype.value}" for ctype in ContentType}
+
+METRICS_DTYPE = np.dtype(
+    [
+        ("original_tokens", "<u4"),
+        ("compressed_tokens", "<u4"),
+        ("savings_ratio", "<f4"),
+        ("cost_savings", "<f4"),
+    ]
+    + [(name, "<u2") for name in COUNT_FIELDS.values()]
+)
+
+class MetricsStore:
+    def __init__(self, chunk_size: int = 65536):
+        self.chunk_size = chunk_size
+        self._chunks: List[np.ndarray] = []
+        self._current = np.zeros(chunk_size, dtype=METRICS_DTYPE)
+        self._fill = 0
+        self._data: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks) + self._fill
+
+    def append_result(self, result: CompressionResult, cost_savings: float):
+        row = self._current[self._fill]
+        row["original_tokens"] = result.original_tokens
+        row["compressed_tokens"] = result.compressed_tokens
+        row["savings_ratio"] = result.savings_ratio
+        row["cost_savings"] = cost_savings
+        for ctype, count in result.content_type_counts.items():
+            row[COUNT_FIELDS[ctype]] = min(count, 0xFFFF)
+        self._fill += 1
+        self._data = None
+        if self._fill == self.chunk_size:
+            self._chunks.append(self._current)
+            self._current = np.zeros(self.chunk_size, dtype=METRICS_DTYPE)
+            self._fill = 0
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            parts = self._chunks + ([self._current[:self._fill]] if self._fill else [])
+            if not parts:
+                self._data = self._current[:0]
+            else:
+                self._data = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return self._data
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[name]
+
+    def save(self, path: str):
+        np.save(path, self.data, allow_pickle=False)
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True, chunk_size: int = 65536) -> "MetricsStore":
+        data = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if data.dtype != METRICS_DTYPE:
+            raise ValueError(f"{path} does not hold a metrics store (dtype {data.dtype})")
+        store = cls(chunk_size)
+        store._chunks.append(data)
+        return store
+
+    def cumulative_savings(self) -> np.ndarray:
+        return np.cumsum(self.column("cost_savings"), dtype=np.float64)
+
+    def content_type_totals(self) -> Dict[ContentType, int]:
+        data = self.data
+        return {ctype: int(data[name].sum(dtype=np.int64)) for ctype, name in COUNT_FIELDS.items()}
+
+    def summary(self) -> Dict:
+        if len(self) == 0:
+            return {}
+        data = self.data
+        ratios = data["savings_ratio"].astype(np.float64)
+        p50, p90, p99 = np.percentile(ratios, [50, 90, 99])
+        return {
+            'total_original_tokens': int(data["original_tokens"].sum(dtype=np.int64)),
+            'total_compressed_tokens': int(data["compressed_tokens"].sum(dtype=np.int64)),
+            'total_cost_savings': float(data["cost_savings"].sum(dtype=np.float64)),
+            'average_compression_ratio': float(ratios.mean()),
+            'compression_ratio_std': float(ratios.std()),
+            'compression_ratio_p50': float(p50),
+            'compression_ratio_p90': float(p90),
+            'compression_ratio_p99': float(p99),
+            'content_type_counts': {ctype: n for ctype, n in self.content_type_totals().items() if n},
+            'num_compressions': len(data)
+        }
@@ -1,8 +1,12 @@
+import hashlib
+import heapq
 import re
+import string
+import time
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Tuple
-from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from collections import Counter, deque
 
 class ContentType(Enum):
     URL = "url"
@@ -16,6 +20,46 @@ class ContentType(Enum):
     HASH = "hash"
     QUOTED = "quoted"
 
+CONTENT_TYPES = list(ContentType)
+CONTENT_TYPE_CODES = {ctype: code for code, ctype in enumerate(CONTENT_TYPES)}
+
+def _class_table(classes: Dict[str, str]) -> bytes:
+    table = bytearray(b" " * 256)
+    for chars, cls in classes.items():
+        for char in chars:
+            table[ord(char)] = ord(cls)
+    return bytes(table)
+
+# Byte classes for the ASCII prefilters: \w characters collapse to one byte per class,
+# everything else to a space, so triggers become plain bytes.find needles.
+WORD_CLASSES = _class_table({
+    string.ascii_lowercase: "a", string.ascii_uppercase: "A", string.digits: "0", "_": "_", ".": "."
+})
+HEX_CLASSES = _class_table({
+    "0123456789abcdef": "x", "ghijklmnopqrstuvwxyz" + string.ascii_uppercase + "_": "w"
+})
+WORD_BYTES = frozenset(b"aA0_")
+EMAIL_LOCAL = frozenset(string.ascii_letters + string.digits + "._%+-")
+EMAIL_DOMAIN = frozenset(string.ascii_letters + string.digits + ".-|")
+# Types whose matches may contain newlines. In corpus mode they are scanned with each
+# match confined to its own document; the others are scanned freely and checked.
+MULTILINE_TYPES = (ContentType.CODE_BLOCK, ContentType.JSON, ContentType.QUOTED)
+BOUNDED_LITERALS = {ContentType.CODE_BLOCK: "```", ContentType.JSON: "{", ContentType.QUOTED: '"'}
+# With a scan budget, span cursors read the clock after this many rejected candidates or
+# triggers, so a type that never yields a span is still stopped.
+BUDGET_CHECK_EVERY = 256
+
+class _BudgetExceeded(Exception):
+    pass
+
+@dataclass
+class BudgetHit:
+    document: int
+    digest: str
+    length: int
+    elapsed: float
+    skipped: List[ContentType]
+
 class PatternDetector:
     PATTERNS = {
         ContentType.URL: r'https?://[^\s<>"{}|\\^`\[\]]+',
@@ -30,22 +74,537 @@ class PatternDetector:
         ContentType.QUOTED: r'"[^"]{20,}"',
     }
 
-    def __init__(self, min_length: int = 15):
+    # Length-bounded variants of patterns whose matching cost is not linear on
+    # adversarial input; CODE_BLOCK gets a str.find scanner instead.
+    SAFE_PATTERNS = {
+        ContentType.EMAIL: r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,63}\b',
+        ContentType.FILE_PATH: r'(?:/[a-zA-Z0-9_.-]+)+/?|(?:[A-Z]:\\(?:[^\\/*?"<>|\r\n]{1,255}\\){0,64}[^\\/*?"<>|\r\n]{0,255})',
+        ContentType.JSON: r'\{[^{}]{0,4096}(?:\{[^{}]{0,4096}\}[^{}]{0,4096}){0,64}\}',
+    }
+
+    ENGINES = ("scan", "legacy")
+
+    def __init__(
+        self,
+        min_length: int = 15,
+        engine: str = "scan",
+        safe: bool = False,
+        scan_budget: Optional[float] = None,
+        max_budget_hits: int = 1000,
+        sink=None,
+        prefilter: bool = True
+    ):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown detector engine: {engine!r}")
         self.min_length = min_length
+        self.engine = engine
+        self.safe = safe
+        self.prefilter = prefilter
+        self.scan_budget = scan_budget
+        patterns = {**self.PATTERNS, **self.SAFE_PATTERNS} if safe else self.PATTERNS
         self.compiled_patterns = {
             ctype: re.compile(pattern)
-            for ctype, pattern in self.PATTERNS.items()
+            for ctype, pattern in patterns.items()
         }
+        self.scanners: Dict[ContentType, Callable[..., Iterator[Tuple[int, int]]]] = {}
+        if safe or prefilter:
+            self.scanners[ContentType.CODE_BLOCK] = self._scan_code_blocks
+        if prefilter:
+            # Each scanner tries the type's regex only at positions its required literal
+            # allows, in order, so spans are exactly those of finditer.
+            self.scanners.update({
+                ContentType.URL: self._scan_urls,
+                ContentType.EMAIL: self._scan_emails,
+                ContentType.INLINE_CODE: self._scan_inline_code,
+                ContentType.FILE_PATH: self._scan_file_paths,
+                ContentType.JSON: self._scan_json,
+                ContentType.IDENTIFIER: self._scan_identifiers,
+                ContentType.VERSION: self._scan_versions,
+                ContentType.HASH: self._scan_hashes,
+                ContentType.QUOTED: self._scan_quoted,
+            })
+        self.documents_scanned = 0
+        self.budget_hits = deque(maxlen=max_budget_hits)
+        self.sink = sink
+
+    def detect_all(self, text: str, pos: int = 0) -> List[Tuple[ContentType, int, int, str]]:
+        self.documents_scanned += 1
+        if self.sink is None:
+            if self.engine == "legacy":
+                return self._detect_legacy(text, pos)
+            return self._detect_scan(text, pos)
+
+        started = time.perf_counter()
+        if self.engine == "legacy":
+            matches = self._detect_legacy(text, pos)
+        else:
+            matches = self._detect_scan(text, pos)
+        elapsed = time.perf_counter() - started
+        self.sink.increment("detect_documents_total")
+        self.sink.increment("detect_chars_scanned_total", max(len(text) - pos, 0))
+        self.sink.increment("detect_seconds_total", elapsed)
+        self.sink.observe_document("detect", self.documents_scanned - 1, elapsed, len(text))
+        return matches
+
+    def detect_corpus(self, texts: Sequence[str]) -> List[List[Tuple[ContentType, int, int, str]]]:
+        # detect_all for many documents in one scan over their "\n"-joined text, with the
+        # same per-document results. Documents touched by a match that crosses a separator
+        # are scanned again on their own.
+        texts = list(texts)
+        if self.engine == "legacy" or self.scan_budget is not None or len(texts) < 2:
+            return [self.detect_all(text) for text in texts]
+
+        started = time.perf_counter()
+        combined = "\n".join(texts)
+        ends = []
+        position = -1
+        for text in texts:
+            position += len(text) + 1
+            ends.append(position)
+        dirty: Set[int] = set()
+        self.documents_scanned += len(texts)
+
+        # Per-type metrics are reported once: candidates from the combined scan, time
+        # including rescans, kept spans from the final per-document results.
+        stats = None
+        if self.sink is not None:
+            stats = ([0.0] * len(self.compiled_patterns), [0] * len(self.compiled_patterns))
+        results = [[] for _ in texts]
+        doc = 0
+        offset = 0
+        for content_type, start, end, content in self._detect_scan(combined, 0, (ends, dirty), stats):
+            while ends[doc] < start:
+                doc += 1
+                offset = ends[doc - 1] + 1
+            if doc not in dirty:
+                results[doc].append((content_type, start - offset, end - offset, content))
+        rescan_stats = None if stats is None else (stats[0], [0] * len(stats[1]))
+        for doc in dirty:
+            results[doc] = self._detect_scan(texts[doc], 0, None, rescan_stats)
+
+        if self.sink is not None:
+            self._report_types(stats[0], stats[1], [match for matches in results for match in matches])
+            self.sink.increment("detect_documents_total", len(texts))
+            self.sink.increment("detect_chars_scanned_total", len(combined) - len(texts) + 1)
+            self.sink.increment("detect_seconds_total", time.perf_counter() - started)
+            self.sink.increment("detect_corpus_rescanned_total", len(dirty))
+        return results
+
+    def _report_types(self, spent: List[float], candidates: List[int], matches: List[Tuple]):
+        kept = Counter(match[0] for match in matches)
+        for priority, content_type in enumerate(self.compiled_patterns):
+            self.sink.increment("detect_type_seconds_total", spent[priority], content_type)
+            self.sink.increment("detect_candidates_total", candidates[priority], content_type)
+            self.sink.increment("detect_kept_total", kept[content_type], content_type)
+
+    def _record_budget_hit(self, text: str, started: float, skipped: List[ContentType]):
+        self.budget_hits.append(BudgetHit(
+            document=self.documents_scanned - 1,
+            digest=hashlib.sha256(text.encode()).hexdigest()[:16],
+            length=len(text),
+            elapsed=time.perf_counter() - started,
+            skipped=skipped
+        ))
+
+    def _detect_scan(self, text: str, pos: int = 0, corpus=None, stats=None) -> List[Tuple[ContentType, int, int, str]]:
+        # Lazily merges one span cursor per type in (start, -end, PATTERNS order), the
+        # same order _detect_legacy sorts into, so overlaps resolve identically without
+        # materialising or sorting every candidate. Each type still scans the text on its
+        # own; the merge alone is no faster than legacy, the prefilter scanners are what
+        # skip text. With stats, a (seconds, candidates)
+        # pair of per-type lists, totals are added there instead of reported.
+        budget = self.scan_budget
+        sink = self.sink
+        timed = budget is not None or sink is not None
+        began = started = time.perf_counter()
+        spent = [0.0] * len(self.compiled_patterns)
+        # Per-type time and candidate totals for the sink; spent is reset per budget window.
+        total_spent = [0.0] * len(spent)
+        candidates = [0] * len(spent)
+        skipped = []
+
+        check = None
+        if budget is not None:
+            ticks = 0
+
+            def check():
+                # Raised inside the running cursor once the current window is used up.
+                nonlocal ticks
+                ticks += 1
+                if ticks >= BUDGET_CHECK_EVERY:
+                    ticks = 0
+                    if time.perf_counter() - started > budget:
+                        raise _BudgetExceeded
+
+        heap = []
+        for priority, content_type in enumerate(self.compiled_patterns):
+            before = time.perf_counter()
+            if budget is not None and before - began > budget:
+                # As in _detect_legacy, types not started once the budget is gone are skipped.
+                skipped.append(content_type)
+                continue
+            spans = self._iter_spans(content_type, text, pos, corpus, check)
+            try:
+                span = next(spans, None)
+            except _BudgetExceeded:
+                skipped.append(content_type)
+                span = None
+            elapsed = time.perf_counter() - before
+            spent[priority] += elapsed
+            total_spent[priority] += elapsed
+            if span is not None:
+                candidates[priority] += 1
+                heap.append((span[0], -span[1], priority, content_type, spans))
+        heapq.heapify(heap)
+
+        matches = []
+        last_end = pos
+        while heap:
+            start, neg_end, priority, content_type, spans = heap[0]
+            if content_type in skipped:
+                heapq.heappop(heap)
+                continue
+            if start >= last_end:
+                last_end = -neg_end
+                matches.append((content_type, start, last_end, text[start:last_end]))
+            if not timed:
+                span = next(spans, None)
+            else:
+                before = time.perf_counter()
+                try:
+                    span = next(spans, None)
+                    overrun = False
+                except _BudgetExceeded:
+                    span = None
+                    overrun = True
+                now = time.perf_counter()
+                spent[priority] += now - before
+                total_spent[priority] += now - before
+                if span is not None:
+                    candidates[priority] += 1
+                if overrun:
+                    # This type used up the window without yielding a span.
+                    skipped.append(content_type)
+                    started = now
+                    spent = [0.0] * len(spent)
+                elif budget is not None and now - started > budget:
+                    # Stop scanning the type that used most of this budget window if it is
+                    # still running; matches already kept for it stay. The remaining
+                    # types then get a fresh window.
+                    culprit_priority = max(range(len(spent)), key=spent.__getitem__)
+                    for entry in heap:
+                        if entry[2] == culprit_priority and entry[3] not in skipped:
+                            skipped.append(entry[3])
+                            if entry[3] is content_type:
+                                span = None
+                    started = now
+                    spent = [0.0] * len(spent)
+            if span is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (span[0], -span[1], priority, content_type, spans))
+
+        if budget is not None and (skipped or time.perf_counter() - began > budget):
+            self._record_budget_hit(text, began, skipped)
+        if stats is not None:
+            for priority in range(len(total_spent)):
+                stats[0][priority] += total_spent[priority]
+                stats[1][priority] += candidates[priority]
+        elif sink is not None:
+            self._report_types(total_spent, candidates, matches)
+        return matches
+
+    def _iter_spans(
+        self,
+        content_type: ContentType,
+        text: str,
+        pos: int = 0,
+        corpus=None,
+        check: Optional[Callable[[], None]] = None
+    ) -> Iterator[Tuple[int, int]]:
+        min_length = self.min_length
+        if corpus is not None:
+            ends, dirty = corpus
+            if content_type in MULTILINE_TYPES:
+                spans = self._bounded_spans(content_type, text, ends)
+            else:
+                spans = self._checked_spans(content_type, text, ends, dirty)
+            for start, end in spans:
+                if end - start >= min_length:
+                    yield start, end
+            return
+        scanner = self.scanners.get(content_type)
+        if scanner is not None:
+            for start, end in scanner(text, pos, check):
+                if end - start >= min_length:
+                    yield start, end
+                elif check is not None:
+                    check()
+            return
+        for match in self.compiled_patterns[content_type].finditer(text, pos):
+            start, end = match.span()
+            if end - start >= min_length:
+                yield start, end
+            elif check is not None:
+                check()
+
+    def _raw_spans(self, content_type: ContentType, text: str) -> Iterator[Tuple[int, int]]:
+        scanner = self.scanners.get(content_type)
+        if scanner is not None:
+            return scanner(text, 0)
+        return (match.span() for match in self.compiled_patterns[content_type].finditer(text))
+
+    def _checked_spans(self, content_type: ContentType, text: str, ends: List[int], dirty: Set[int]) -> Iterator[Tuple[int, int]]:
+        # ends[i] is the separator after document i (the text length for the last one).
+        # A span covering a separator, kept or not, changes what this type finds next, so
+        # every document it reaches is marked for a separate scan.
+        doc = 0
+        for start, end in self._raw_spans(content_type, text):
+            while ends[doc] < start:
+                doc += 1
+            if end > ends[doc]:
+                last = doc
+                while ends[last] < end:
+                    last += 1
+                dirty.update(range(doc, last + 1))
+            yield start, end
+
+    def _bounded_spans(self, content_type: ContentType, text: str, ends: List[int]) -> Iterator[Tuple[int, int]]:
+        # Each match ends within the document it starts in, as if scanned alone. Code
+        # fences are paired with str.find whenever detect_all would (prefilter or safe).
+        pattern = self.compiled_patterns[content_type]
+        if content_type not in self.scanners:
+            start = 0
+            for end in ends:
+                for match in pattern.finditer(text, start, end):
+                    yield match.span()
+                start = end + 1
+            return
+        literal = BOUNDED_LITERALS[content_type]
+        find = text.find
+        doc = 0
+        pos = 0
+        while True:
+            start = find(literal, pos)
+            if start < 0:
+                return
+            while ends[doc] < start:
+                doc += 1
+            if content_type is ContentType.CODE_BLOCK:
+                close = find("```", start + 3, ends[doc])
+                if close < 0:
+                    # No partner for this fence, so none for any later one in the document.
+                    pos = ends[doc] + 1
+                    continue
+                pos = close + 3
+                yield start, pos
+                continue
+            found = pattern.match(text, start, ends[doc])
+            if found is None:
+                pos = start + 1
+            else:
+                pos = found.end()
+                yield start, pos
+
+    def _scan_code_blocks(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # Same spans as CODE_BLOCK's lazy regex: each fence pairs with the next one, and
+        # once a fence has no partner no later fence can have one either.
+        while True:
+            start = text.find("```", pos)
+            if start < 0:
+                return
+            close = text.find("```", start + 3)
+            if close < 0:
+                return
+            pos = close + 3
+            yield start, pos
+
+    def _scan_literal_starts(self, content_type: ContentType, literal: str, text: str, pos: int, check=None) -> Iterator[Tuple[int, int]]:
+        # check, when given, is called for every rejected trigger (see _detect_scan).
+        match = self.compiled_patterns[content_type].match
+        find = text.find
+        while True:
+            start = find(literal, pos)
+            if start < 0:
+                return
+            found = match(text, start)
+            if found is None:
+                pos = start + 1
+                if check is not None:
+                    check()
+            else:
+                pos = found.end()
+                yield start, pos
+
+    def _scan_urls(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        return self._scan_literal_starts(ContentType.URL, "http", text, pos, check)
+
+    def _scan_inline_code(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        return self._scan_literal_starts(ContentType.INLINE_CODE, "`", text, pos, check)
+
+    def _scan_json(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        return self._scan_literal_starts(ContentType.JSON, "{", text, pos, check)
+
+    def _scan_quoted(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        return self._scan_literal_starts(ContentType.QUOTED, '"', text, pos, check)
+
+    def _scan_file_paths(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # Unix paths start at "/", Windows paths at an uppercase drive letter before ":\".
+        match = self.compiled_patterns[ContentType.FILE_PATH].match
+        find = text.find
+        slash = find("/", pos)
+        colon = find(":\\", pos + 1)
+        while slash >= 0 or colon >= 0:
+            if colon >= 0 and (slash < 0 or colon - 1 < slash):
+                start = colon - 1
+                found = match(text, start) if "A" <= text[start] <= "Z" else None
+            else:
+                start = slash
+                found = match(text, start)
+            if found is None:
+                pos = start + 1
+                if check is not None:
+                    check()
+            else:
+                pos = found.end()
+                yield start, pos
+            if 0 <= slash < pos:
+                slash = find("/", pos)
+            if 0 <= colon and colon - 1 < pos:
+                colon = find(":\\", pos + 1)
+
+    def _scan_emails(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # A match holds exactly one "@", so the regex only needs the run of local-part
+        # characters before it and domain characters after it (plus one for the final \b).
+        search = self.compiled_patterns[ContentType.EMAIL].search
+        find = text.find
+        size = len(text)
+        while True:
+            at = find("@", pos)
+            if at < 0:
+                return
+            start = at
+            while start > pos and text[start - 1] in EMAIL_LOCAL:
+                start -= 1
+            end = at + 1
+            while end < size and text[end] in EMAIL_DOMAIN:
+                end += 1
+            found = search(text, start, min(size, end + 1))
+            if found is None:
+                pos = at + 1
+                if check is not None:
+                    check()
+            else:
+                pos = found.end()
+                yield found.span()
+
+    def _scan_identifiers(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # A match is a whole word containing a lower-to-upper or a letter_letter
+        # transition; only words with one are tried.
+        pattern = self.compiled_patterns[ContentType.IDENTIFIER]
+        if not text.isascii():
+            yield from (match.span() for match in pattern.finditer(text, pos))
+            return
+        classes = text.encode("ascii").translate(WORD_CLASSES)
+        find = classes.find
+        size = len(classes)
+        camel = find(b"aA", pos)
+        snake = find(b"a_a", pos)
+        while camel >= 0 or snake >= 0:
+            trigger = camel if snake < 0 or 0 <= camel < snake else snake
+            start = trigger
+            while start > 0 and classes[start - 1] in WORD_BYTES:
+                start -= 1
+            end = trigger + 2
+            while end < size and classes[end] in WORD_BYTES:
+                end += 1
+            found = pattern.match(text, start) if start >= pos else None
+            if found is not None:
+                yield found.span()
+            elif check is not None:
+                check()
+            pos = end
+            if 0 <= camel < pos:
+                camel = find(b"aA", pos)
+            if 0 <= snake < pos:
+                snake = find(b"a_a", pos)
+
+    def _scan_versions(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # A match starts at the first digit of a run followed by ".<digit>".
+        pattern = self.compiled_patterns[ContentType.VERSION]
+        if not text.isascii():
+            yield from (match.span() for match in pattern.finditer(text, pos))
+            return
+        classes = text.encode("ascii").translate(WORD_CLASSES)
+        find = classes.find
+        digit = ord("0")
+        trigger = find(b"0.0", pos)
+        while trigger >= 0:
+            start = trigger
+            while start > 0 and classes[start - 1] == digit:
+                start -= 1
+            found = pattern.match(text, start) if start >= pos else None
+            if found is None:
+                trigger = find(b"0.0", trigger + 1)
+                if check is not None:
+                    check()
+            else:
+                yield found.span()
+                trigger = find(b"0.0", found.end())
+
+    def _scan_hashes(self, text: str, pos: int = 0, check=None) -> Iterator[Tuple[int, int]]:
+        # A match is a whole word of 32-64 lowercase hex digits, so it contains a run of 32.
+        pattern = self.compiled_patterns[ContentType.HASH]
+        if not text.isascii():
+            yield from (match.span() for match in pattern.finditer(text, pos))
+            return
+        classes = text.encode("ascii").translate(HEX_CLASSES)
+        find = classes.find
+        size = len(classes)
+        hex_digit, other_word = ord("x"), ord("w")
+        needle = b"x" * 32
+        run = find(needle, pos)
+        while run >= 0:
+            start = run
+            while start > 0 and classes[start - 1] == hex_digit:
+                start -= 1
+            end = run + 32
+            while end < size and classes[end] in (hex_digit, other_word):
+                end += 1
+            found = None
+            if start >= pos and (start == 0 or classes[start - 1] != other_word):
+                found = pattern.match(text, start)
+            if found is not None:
+                yield found.span()
+            elif check is not None:
+                check()
+            run = find(needle, end)
 
-    def detect_all(self, text: str) -> List[Tuple[ContentType, int, int, str]]:
+    def _detect_legacy(self, text: str, pos: int = 0) -> List[Tuple[ContentType, int, int, str]]:
+        started = time.perf_counter()
+        skipped = []
         matches = []
+        spent = []
+        candidates = []
         for content_type, pattern in self.compiled_patterns.items():
-            for match in pattern.finditer(text):
-                content = match.group()
-                if len(content) >= self.min_length:
-                    matches.append((content_type, match.start(), match.end(), content))
+            before = time.perf_counter()
+            found = len(matches)
+            if self.scan_budget is not None and before - started > self.scan_budget:
+                skipped.append(content_type)
+            else:
+                for match in pattern.finditer(text, pos):
+                    content = match.group()
+                    if len(content) >= self.min_length:
+                        matches.append((content_type, match.start(), match.end(), content))
+            spent.append(time.perf_counter() - before)
+            candidates.append(len(matches) - found)
+        if self.scan_budget is not None and (skipped or time.perf_counter() - started > self.scan_budget):
+            self._record_budget_hit(text, started, skipped)
         matches.sort(key=lambda x: (x[1], -x[2]))
-        return self._remove_overlaps(matches)
+        matches = self._remove_overlaps(matches)
+        if self.sink is not None:
+            self._report_types(spent, candidates, matches)
+        return matches
 
     def _remove_overlaps(self, matches: List[Tuple]) -> List[Tuple]:
         if not matches:
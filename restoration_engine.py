@@ -1,29 +1,188 @@
 import hashlib
-from typing import Dict, Tuple, List
-from compression_engine import Placeholder, CompressionResult
+import re
+import time
+import zlib
+from typing import Dict, Tuple, List, Mapping, Optional, Union
+from compression_engine import (
+    Placeholder, CompressionResult, PlaceholderCodebook, PLACEHOLDER_PATTERN, INTEGRITY_MODES, checksum_mode,
+    _validate_integrity
+)
+from result_format import loads
+
+# Any suffix a later chunk could complete into a placeholder: "@", "@@", "@@P", "@@P12", "@@P12@".
+PARTIAL_PLACEHOLDER = re.compile(r'@(?:@(?:P(?:\d+(?:@)?)?)?)?\Z')
 
 class RestorationEngine:
+    # Optional instrumentation.MetricsSink shared by all restores.
+    sink = None
+    documents_restored = 0
+
+    # Every method taking `integrity` verifies each checksum in the mode that produced it
+    # (inferred from its type, so older strong-checksum results keep verifying) when it is
+    # None. "none" skips checksum verification; "fast" or "strong" additionally reject
+    # placeholders whose checksum is weaker than that.
+
     @staticmethod
-    def restore(compressed_text: str, placeholders: Dict[str, Placeholder]) -> Tuple[str, bool, List[str]]:
-        restored_text = compressed_text
-        integrity_passed = True
+    def restore(
+        compressed_text: str,
+        placeholders: Dict[str, Placeholder],
+        integrity: Optional[str] = None
+    ) -> Tuple[str, bool, List[str]]:
+        started = time.perf_counter()
+        restored_text, found, _ = RestorationEngine._substitute(compressed_text, placeholders)
+        substituted = time.perf_counter()
+
+        errors = RestorationEngine._verify(placeholders, found, integrity)
+        integrity_passed = not errors
+        RestorationEngine.documents_restored += 1
+
+        sink = RestorationEngine.sink
+        if sink is not None:
+            finished = time.perf_counter()
+            sink.increment("restore_documents_total")
+            sink.increment("restore_chars_total", len(restored_text))
+            sink.increment("restore_placeholders_total", len(found))
+            sink.increment("restore_errors_total", len(errors))
+            sink.increment("restore_seconds_total", finished - started)
+            sink.increment("restore_substitute_seconds_total", substituted - started)
+            sink.increment("restore_verify_seconds_total", finished - substituted)
+            sink.observe_document("restore", RestorationEngine.documents_restored - 1, finished - started, len(restored_text))
+        return restored_text, integrity_passed, errors
+
+    @staticmethod
+    def restore_from_codebook(
+        compressed_text: str,
+        codebook: PlaceholderCodebook,
+        integrity: Optional[str] = None
+    ) -> Tuple[str, bool, List[str]]:
+        if integrity is not None:
+            _validate_integrity(integrity)
+        restored_text, found, unknown = RestorationEngine._substitute(compressed_text, codebook)
+
         errors = []
+        for placeholder_id, entry in found.items():
+            error = RestorationEngine._check(placeholder_id, entry, integrity)
+            if error:
+                errors.append(error)
+        for placeholder_id in unknown:
+            errors.append(f"Placeholder {placeholder_id} not found in codebook")
+        return restored_text, not errors, errors
+
+    @staticmethod
+    def restore_binary(buffer, offset: int = 0, integrity: Optional[str] = None) -> Tuple[str, bool, List[str]]:
+        # Restores a result_format record in place, e.g. from a ResultFile's mapping.
+        result = loads(buffer, offset)
+        return RestorationEngine.restore(result.compressed_text, result.placeholders, integrity)
 
+    @staticmethod
+    def verify_integrity(result: CompressionResult, integrity: Optional[str] = None) -> Tuple[bool, List[str]]:
+        # Same checks as restore() without building the restored text.
+        found = {match.group() for match in PLACEHOLDER_PATTERN.finditer(result.compressed_text)}
+        errors = RestorationEngine._verify(result.placeholders, found, integrity)
+        return not errors, errors
+
+    @staticmethod
+    def _verify(placeholders: Mapping, found, integrity: Optional[str]) -> List[str]:
+        if integrity is not None:
+            _validate_integrity(integrity)
+        errors = []
         for placeholder_id, placeholder in placeholders.items():
-            if placeholder_id in restored_text:
-                restored_text = restored_text.replace(placeholder_id, placeholder.original)
-                current_checksum = hashlib.sha256(placeholder.original.encode()).hexdigest()[:8]
-                if current_checksum != placeholder.checksum:
-                    integrity_passed = False
-                    errors.append(
-                        f"Checksum mismatch for {placeholder_id}: expected {placeholder.checksum}, got {current_checksum}"
-                    )
+            if placeholder_id in found:
+                error = RestorationEngine._check(placeholder_id, placeholder, integrity)
+                if error:
+                    errors.append(error)
             else:
-                integrity_passed = False
                 errors.append(f"Placeholder {placeholder_id} not found in text")
-        return restored_text, integrity_passed, errors
+        return errors
 
     @staticmethod
-    def verify_integrity(result: CompressionResult) -> Tuple[bool, List[str]]:
-        _, integrity, errors = RestorationEngine.restore(result.compressed_text, result.placeholders)
-        return integrity, errors
\ No newline at end of file
+    def _substitute(compressed_text: str, placeholders: Mapping) -> Tuple[str, Dict, List[str]]:
+        segments = []
+        found = {}
+        unknown = {}
+        last_end = 0
+        for match in PLACEHOLDER_PATTERN.finditer(compressed_text):
+            placeholder_id = match.group()
+            placeholder = placeholders.get(placeholder_id)
+            if placeholder is None:
+                unknown[placeholder_id] = None
+                continue
+            segments.append(compressed_text[last_end:match.start()])
+            segments.append(placeholder.original)
+            last_end = match.end()
+            found[placeholder_id] = placeholder
+        segments.append(compressed_text[last_end:])
+        return "".join(segments), found, list(unknown)
+
+    @staticmethod
+    def _check(placeholder_id: str, placeholder, integrity: Optional[str] = None) -> str:
+        if integrity == "none":
+            return ""
+        expected = placeholder.checksum
+        mode = checksum_mode(expected)
+        if integrity is not None and INTEGRITY_MODES.index(mode) < INTEGRITY_MODES.index(integrity):
+            return f"Placeholder {placeholder_id} has a {mode} checksum, {integrity} required"
+        if mode == "none":
+            return ""
+        if mode == "fast":
+            current_checksum = zlib.crc32(placeholder.original.encode())
+        else:
+            current_checksum = hashlib.sha256(placeholder.original.encode()).hexdigest()[:len(expected)]
+        if current_checksum != expected:
+            return f"Checksum mismatch for {placeholder_id}: expected {expected}, got {current_checksum}"
+        return ""
+
+class StreamingRestorer:
+    # Restores model output chunk by chunk. feed() returns all text that can no longer
+    # change; only a trailing partial placeholder is held back until the next chunk.
+    # Checksums are verified the first time each placeholder resolves.
+    def __init__(self, placeholders: Union[Mapping[str, Placeholder], PlaceholderCodebook], integrity: Optional[str] = None):
+        if integrity is not None:
+            _validate_integrity(integrity)
+        self.placeholders = placeholders
+        self.integrity = integrity
+        self.found: Dict[str, object] = {}
+        self.unknown: Dict[str, None] = {}
+        self.errors: List[str] = []
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        segments = []
+        last_end = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            placeholder_id = match.group()
+            placeholder = self.placeholders.get(placeholder_id)
+            if placeholder is None:
+                self.unknown[placeholder_id] = None
+                continue
+            if placeholder_id not in self.found:
+                self.found[placeholder_id] = placeholder
+                error = RestorationEngine._check(placeholder_id, placeholder, self.integrity)
+                if error:
+                    self.errors.append(error)
+            segments.append(text[last_end:match.start()])
+            segments.append(placeholder.original)
+            last_end = match.end()
+
+        partial = PARTIAL_PLACEHOLDER.search(text, last_end)
+        cut = partial.start() if partial is not None else len(text)
+        segments.append(text[last_end:cut])
+        self._pending = text[cut:]
+        return "".join(segments)
+
+    def finish(self) -> Tuple[str, bool, List[str]]:
+        # Returns the held-back text (emitted verbatim), the integrity flag and all errors.
+        # With a codebook, entries that never appeared are not errors.
+        tail = self._pending
+        self._pending = ""
+        errors = list(self.errors)
+        if tail.startswith("@@P"):
+            errors.append(f"Incomplete placeholder at end of stream: {tail}")
+        if not isinstance(self.placeholders, PlaceholderCodebook):
+            for placeholder_id in self.placeholders:
+                if placeholder_id not in self.found:
+                    errors.append(f"Placeholder {placeholder_id} not found in text")
+        for placeholder_id in self.unknown:
+            errors.append(f"Placeholder {placeholder_id} is not a known placeholder")
+        return tail, not errors, errors
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from pattern_detector import PatternDetector, ContentType
+from compression_engine import CompressionEngine, CompressionResult, Placeholder, PlaceholderTable, Checksum
+from restoration_engine import PLACEHOLDER_PATTERN
+from tokenizer import Tokenizer
+
+@dataclass
+class CachedCompression:
+    # A result with placeholders numbered from 0: occurrences are (position, index) pairs
+    # in compressed_text, entries are (original, content type, checksum) per index.
+    compressed_text: str
+    occurrences: List[Tuple[int, int]]
+    entries: List[Tuple[str, ContentType, Checksum]]
+    original_tokens: int
+    compressed_tokens: int
+    base: int
+    content_type_counts: Dict[ContentType, int]
+
+    @property
+    def size(self) -> int:
+        return (
+            len(self.compressed_text)
+            + sum(len(original) for original, _, _ in self.entries)
+            + 16 * len(self.occurrences)
+            + 64 * len(self.entries)
+            + 128
+        )
+
+    def to_payload(self) -> bytes:
+        return json.dumps([
+            self.compressed_text,
+            self.occurrences,
+            [(original, ctype.value, checksum) for original, ctype, checksum in self.entries],
+            self.original_tokens,
+            self.compressed_tokens,
+            self.base,
+            {ctype.value: n for ctype, n in self.content_type_counts.items()},
+        ]).encode()
+
+    @classmethod
+    def from_payload(cls, payload: bytes) -> "CachedCompression":
+        compressed_text, occurrences, entries, original_tokens, compressed_tokens, base, counts = json.loads(payload)
+        return cls(
+            compressed_text=compressed_text,
+            occurrences=[tuple(occurrence) for occurrence in occurrences],
+            entries=[(original, ContentType(ctype), checksum) for original, ctype, checksum in entries],
+            original_tokens=original_tokens,
+            compressed_tokens=compressed_tokens,
+            base=base,
+            content_type_counts={ContentType(ctype): n for ctype, n in counts.items()}
+        )
+
+def detector_fingerprint(detector: PatternDetector) -> str:
+    config = [detector.min_length]
+    config += sorted((ctype.value, p.pattern, p.flags) for ctype, p in detector.compiled_patterns.items())
+    config += sorted((ctype.value, scanner.__name__) for ctype, scanner in detector.scanners.items())
+    return hashlib.sha256(repr(config).encode()).hexdigest()
+
+def tokenizer_fingerprint(tokenizer: Tokenizer) -> str:
+    ranks = getattr(tokenizer, "ranks", None)
+    if ranks is None:
+        return type(tokenizer).__qualname__
+    merges = "\n".join(f"{a} {b}" for a, b in sorted(ranks, key=ranks.get))
+    return f"{type(tokenizer).__qualname__}:{hashlib.sha256(merges.encode()).hexdigest()}"
+
+class ResultCache:
+    # In-process LRU bounded by an estimate of retained bytes, optionally backed by a
+    # SQLite file that several worker processes can share (WAL mode).
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None, max_disk_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.bypassed = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[str, CachedCompression]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._fingerprints = weakref.WeakKeyDictionary()
+        self._disk_puts = 0
+
+    def __getstate__(self) -> Dict:
+        # Worker processes get an empty memory tier and their own SQLite connection.
+        state = self.__dict__.copy()
+        state['_entries'] = OrderedDict()
+        state['bytes'] = 0
+        state['_lock'] = None
+        state['_local'] = None
+        state['_fingerprints'] = None
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._fingerprints = weakref.WeakKeyDictionary()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'disk_evictions': self.disk_evictions,
+            'bypassed': self.bypassed,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+        if self.path is not None:
+            with self._connection() as connection:
+                connection.execute("DELETE FROM results")
+
+    def compress(self, engine: CompressionEngine, text: str) -> CompressionResult:
+        key = self._key(engine, text)
+        cached = self._lookup(key)
+        if cached is not None:
+            return self._materialize(engine, text, cached)
+
+        base = engine.placeholder_counter
+        scanned = engine.detector.documents_scanned
+        result = engine._compress(text)
+        budget_hits = engine.detector.budget_hits
+        if budget_hits and budget_hits[-1].document >= scanned:
+            # A scan budget cut detection short; do not pin a partial result.
+            self.bypassed += 1
+            return result
+        self._store(key, self._normalize(result, base))
+        return result
+
+    def _key(self, engine: CompressionEngine, text: str) -> str:
+        fingerprint = self._fingerprints.get(engine)
+        if fingerprint is None:
+            config = f"{detector_fingerprint(engine.detector)}|{tokenizer_fingerprint(engine.tokenizer)}|{engine.dedupe}|{engine.integrity}"
+            fingerprint = hashlib.sha256(config.encode()).hexdigest()[:16]
+            self._fingerprints[engine] = fingerprint
+        return f"{fingerprint}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    def _lookup(self, key: str) -> Optional[CachedCompression]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+        if self.path is not None:
+            with self._connection() as connection:
+                row = connection.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            if row is not None:
+                cached = CachedCompression.from_payload(row[0])
+                self.disk_hits += 1
+                self._remember(key, cached)
+                return cached
+        self.misses += 1
+        return None
+
+    def _store(self, key: str, cached: CachedCompression):
+        self._remember(key, cached)
+        if self.path is None:
+            return
+        payload = cached.to_payload()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            self._disk_puts += 1
+            if self.max_disk_bytes is not None and self._disk_puts % 64 == 0:
+                self._evict_disk(connection)
+
+    def _remember(self, key: str, cached: CachedCompression):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self._entries[key] = cached
+            self.bytes += cached.size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def _evict_disk(self, connection: sqlite3.Connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        freed = 0
+        victims = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.disk_evictions += len(victims)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _normalize(result: CompressionResult, base: int) -> CachedCompression:
+        placeholders = result.placeholders
+        occurrences = []
+        for match in PLACEHOLDER_PATTERN.finditer(result.compressed_text):
+            if match.group() in placeholders:
+                occurrences.append((match.start(), int(match.group()[3:-2]) - base))
+        entries = [
+            (p.original, p.content_type, p.checksum)
+            for p in sorted(placeholders.values(), key=lambda p: int(p.id[3:-2]))
+        ]
+        return CachedCompression(
+            compressed_text=result.compressed_text,
+            occurrences=occurrences,
+            entries=entries,
+            original_tokens=result.original_tokens,
+            compressed_tokens=result.compressed_tokens,
+            base=base,
+            content_type_counts=dict(result.content_type_counts)
+        )
+
+    @staticmethod
+    def _materialize(engine: CompressionEngine, text: str, cached: CachedCompression) -> CompressionResult:
+        # Renumber from the engine's counter exactly as a fresh compress would, shifting
+        # every position by the change in ID lengths.
+        base = engine.placeholder_counter
+        engine.placeholder_counter += len(cached.entries)
+        ids = [f"@@P{base + index}@@" for index in range(len(cached.entries))]
+        starts = [-1] * len(ids)
+
+        source = cached.compressed_text
+        segments = []
+        last_end = 0
+        position = 0
+        for start, index in cached.occurrences:
+            segments.append(source[last_end:start])
+            position += start - last_end
+            if starts[index] < 0:
+                starts[index] = position
+            segments.append(ids[index])
+            position += len(ids[index])
+            last_end = start + len(f"@@P{cached.base + index}@@")
+        segments.append(source[last_end:])
+        compressed_text = "".join(segments)
+
+        if engine.compact:
+            placeholders = PlaceholderTable(integrity=engine.integrity)
+            for index, (original, ctype, checksum) in enumerate(cached.entries):
+                placeholders.add(base + index, starts[index], ctype, checksum, original, 0)
+            placeholders.freeze()
+        else:
+            placeholders = {
+                placeholder_id: Placeholder(
+                    id=placeholder_id,
+                    original=original,
+                    content_type=ctype,
+                    start_pos=starts[index],
+                    end_pos=starts[index] + len(placeholder_id),
+                    checksum=checksum
+                )
+                for index, (placeholder_id, (original, ctype, checksum)) in enumerate(zip(ids, cached.entries))
+            }
+
+        compressed_tokens = cached.compressed_tokens
+        if base != cached.base and not engine.tokenizer.placeholder_invariant:
+            compressed_tokens = engine._estimate_tokens(compressed_text)
+        original_tokens = cached.original_tokens
+        return CompressionResult(
+            original_text=text if engine.keep_original_text else None,
+            compressed_text=compressed_text,
+            placeholders=placeholders,
+            original_tokens=original_tokens,
+            compressed_tokens=compressed_tokens,
+            savings_ratio=1 - (compressed_tokens / original_tokens) if original_tokens > 0 else 0,
+            content_type_counts=dict(cached.content_type_counts)
+        )
@@ -0,0 +1,259 @@
+import mmap
+import struct
+from array import array
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+from pattern_detector import CONTENT_TYPES, CONTENT_TYPE_CODES, ContentType
+from compression_engine import CompressionResult, Placeholder, PlaceholderTable, checksum_mode
+
+# Record layout (all integers little-endian, varints are unsigned LEB128):
+#   header        magic "TSQZ", version u8, flags u8, reserved u16, record length u32,
+#                 original tokens u32, compressed tokens u32, savings ratio f64, placeholder count u32
+#   type counts   varint n, then n x (varint content type code, varint count)
+#   compressed    varint byte length, UTF-8 bytes
+#   string table  varint byte length, UTF-8 bytes of all originals in placeholder order
+#   placeholders  per placeholder: varint ID number, varint start position,
+#                 u8 content type code, 4-byte checksum (big-endian; absent with
+#                 FLAG_NO_CHECKSUM), varint original length (characters)
+#   original text varint byte length, UTF-8 bytes (only with FLAG_ORIGINAL_TEXT)
+# Content type codes are positions in ContentType; new types must be appended.
+# Version 2 added FLAG_FAST_CHECKSUM (CRC-32) and FLAG_NO_CHECKSUM; records with strong
+# checksums are still written as version 1 so older readers keep loading them.
+
+MAGIC = b"TSQZ"
+VERSION = 2
+FLAG_ORIGINAL_TEXT = 1
+FLAG_FAST_CHECKSUM = 2
+FLAG_NO_CHECKSUM = 4
+INTEGRITY_FLAGS = {"strong": 0, "fast": FLAG_FAST_CHECKSUM, "none": FLAG_NO_CHECKSUM}
+HEADER = struct.Struct("<4sBBHIIIdI")
+
+def encode_varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varint(buffer, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _encode_text(text: str, out: bytearray):
+    data = text.encode("utf-8")
+    encode_varint(len(data), out)
+    out += data
+
+def _decode_text(buffer, pos: int) -> Tuple[str, int]:
+    length, pos = decode_varint(buffer, pos)
+    return str(buffer[pos:pos + length], "utf-8"), pos + length
+
+def _integrity(result: CompressionResult, placeholders: List) -> str:
+    if isinstance(result.placeholders, PlaceholderTable):
+        return result.placeholders.integrity
+    modes = {checksum_mode(p.checksum) for p in placeholders}
+    if len(modes) > 1:
+        raise ValueError(f"Placeholders mix checksum modes: {', '.join(sorted(modes))}")
+    return modes.pop() if modes else "strong"
+
+def dumps(result: CompressionResult) -> bytes:
+    placeholders = list(result.placeholders.values())
+    integrity = _integrity(result, placeholders)
+    flags = INTEGRITY_FLAGS[integrity]
+    if result.original_text is not None:
+        flags |= FLAG_ORIGINAL_TEXT
+    out = bytearray(HEADER.size)
+
+    counts = [(CONTENT_TYPE_CODES[ctype], n) for ctype, n in result.content_type_counts.items()]
+    encode_varint(len(counts), out)
+    for code, n in counts:
+        encode_varint(code, out)
+        encode_varint(n, out)
+
+    _encode_text(result.compressed_text, out)
+    _encode_text("".join(p.original for p in placeholders), out)
+    for p in placeholders:
+        if integrity == "strong":
+            checksum = bytes.fromhex(p.checksum)
+            if len(checksum) != 4:
+                raise ValueError(f"Placeholder {p.id} has a checksum that is not 8 hex digits: {p.checksum!r}")
+        elif integrity == "fast":
+            checksum = p.checksum.to_bytes(4, "big")
+        else:
+            checksum = b""
+        encode_varint(int(p.id[3:-2]), out)
+        encode_varint(p.start_pos, out)
+        out.append(CONTENT_TYPE_CODES[p.content_type])
+        out += checksum
+        encode_varint(len(p.original), out)
+    if flags & FLAG_ORIGINAL_TEXT:
+        _encode_text(result.original_text, out)
+
+    HEADER.pack_into(
+        out, 0, MAGIC, 1 if integrity == "strong" else VERSION, flags, 0, len(out),
+        result.original_tokens, result.compressed_tokens, result.savings_ratio, len(placeholders)
+    )
+    return bytes(out)
+
+def read_header(buffer, offset: int = 0) -> Tuple:
+    magic, version, flags, _, length, original_tokens, compressed_tokens, savings_ratio, count = \
+        HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC:
+        raise ValueError(f"Not a compression result record at offset {offset}")
+    if version > VERSION:
+        raise ValueError(f"Unsupported record version {version} (newest supported is {VERSION})")
+    return flags, length, original_tokens, compressed_tokens, savings_ratio, count
+
+def loads(buffer: Union[bytes, memoryview, mmap.mmap], offset: int = 0) -> CompressionResult:
+    # Text is decoded straight from the buffer; placeholders come back as a PlaceholderTable
+    # whose string table is the decoded originals section.
+    buffer = memoryview(buffer)
+    flags, _, original_tokens, compressed_tokens, savings_ratio, count = read_header(buffer, offset)
+    pos = offset + HEADER.size
+
+    n, pos = decode_varint(buffer, pos)
+    content_type_counts = {}
+    for _ in range(n):
+        code, pos = decode_varint(buffer, pos)
+        value, pos = decode_varint(buffer, pos)
+        content_type_counts[CONTENT_TYPES[code]] = value
+
+    compressed_text, pos = _decode_text(buffer, pos)
+    if flags & FLAG_NO_CHECKSUM:
+        integrity, checksum_size = "none", 0
+    else:
+        integrity, checksum_size = ("fast" if flags & FLAG_FAST_CHECKSUM else "strong"), 4
+    table = PlaceholderTable(integrity=integrity)
+    table.source, pos = _decode_text(buffer, pos)
+    offset_in_table = 0
+    for _ in range(count):
+        number, pos = decode_varint(buffer, pos)
+        start_pos, pos = decode_varint(buffer, pos)
+        code = buffer[pos]
+        checksum = int.from_bytes(buffer[pos + 1:pos + 1 + checksum_size], "big")
+        length, pos = decode_varint(buffer, pos + 1 + checksum_size)
+        table.numbers.append(number)
+        table.starts.append(start_pos)
+        table.types.append(code)
+        table.checksums.append(checksum)
+        table.offsets.append(offset_in_table)
+        table.lengths.append(length)
+        offset_in_table += length
+    table._table_size = offset_in_table
+    table.freeze()
+
+    original_text = None
+    if flags & FLAG_ORIGINAL_TEXT:
+        original_text, pos = _decode_text(buffer, pos)
+
+    return CompressionResult(
+        original_text=original_text,
+        compressed_text=compressed_text,
+        placeholders=table,
+        original_tokens=original_tokens,
+        compressed_tokens=compressed_tokens,
+        savings_ratio=savings_ratio,
+        content_type_counts=content_type_counts
+    )
+
+# JSON-lines form used by the CLI and the socket service: one object per result, with
+# the original text left out.
+
+RESULT_FIELDS = (
+    "compressed_text", "placeholders", "original_tokens", "compressed_tokens",
+    "savings_ratio", "content_type_counts"
+)
+
+def result_to_record(result: CompressionResult) -> Dict:
+    return {
+        'compressed_text': result.compressed_text,
+        'placeholders': [
+            {
+                'id': p.id,
+                'original': p.original,
+                'type': p.content_type.value,
+                'start': p.start_pos,
+                'end': p.end_pos,
+                'checksum': p.checksum,
+            }
+            for p in result.placeholders.values()
+        ],
+        'original_tokens': result.original_tokens,
+        'compressed_tokens': result.compressed_tokens,
+        'savings_ratio': result.savings_ratio,
+        'content_type_counts': {ctype.value: n for ctype, n in result.content_type_counts.items()},
+    }
+
+def record_to_result(record: Dict) -> CompressionResult:
+    placeholders = {
+        p['id']: Placeholder(
+            id=p['id'],
+            original=p['original'],
+            content_type=ContentType(p['type']),
+            start_pos=p['start'],
+            end_pos=p['end'],
+            checksum=p['checksum']
+        )
+        for p in record['placeholders']
+    }
+    return CompressionResult(
+        original_text=None,
+        compressed_text=record['compressed_text'],
+        placeholders=placeholders,
+        original_tokens=record['original_tokens'],
+        compressed_tokens=record['compressed_tokens'],
+        savings_ratio=record['savings_ratio'],
+        content_type_counts={ContentType(k): n for k, n in record.get('content_type_counts', {}).items()}
+    )
+
+def dump_records(results: Iterable[CompressionResult], f: BinaryIO) -> int:
+    written = 0
+    for result in results:
+        f.write(dumps(result))
+        written += 1
+    return written
+
+class ResultFile:
+    # Memory-mapped sequence of records. Opening walks the fixed-size headers only;
+    # records are decoded from the mapping when accessed.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._map = b""
+        self.buffer = memoryview(self._map)
+        self.offsets = array('q')
+        offset = 0
+        size = len(self.buffer)
+        while offset < size:
+            self.offsets.append(offset)
+            offset += read_header(self.buffer, offset)[1]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> CompressionResult:
+        return loads(self.buffer, self.offsets[index])
+
+    def __iter__(self) -> Iterator[CompressionResult]:
+        for offset in self.offsets:
+            yield loads(self.buffer, offset)
+
+    def close(self):
+        self.buffer.release()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "ResultFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,100 @@
+import random
+import string
+from typing import Callable, Dict, List
+from pattern_detector import ContentType
+
+WORDS = (
+    "the of and to in is for on that with as by this from at be are it an or was "
+    "request response service deploy build cluster version release config update "
+    "error warning latency throughput cache token prompt model worker queue batch "
+    "retry timeout install upgrade documentation endpoint database pipeline"
+).split()
+
+def _slug(rng: random.Random, parts: int = 3) -> str:
+    return "-".join(rng.choice(WORDS) for _ in range(parts))
+
+def _url(rng: random.Random) -> str:
+    path = "/".join(_slug(rng, 2) for _ in range(rng.randint(1, 4)))
+    return f"https://{_slug(rng)}.example.com/{path}"
+
+def _email(rng: random.Random) -> str:
+    return f"{_slug(rng, 2)}@{_slug(rng, 2)}.io"
+
+def _code_block(rng: random.Random) -> str:
+    lines = [f"    {rng.choice(WORDS)}_{rng.choice(WORDS)} = {rng.randint(0, 999)}" for _ in range(rng.randint(2, 8))]
+    return "```python\ndef handler():\n" + "\n".join(lines) + "\n```"
+
+def _inline_code(rng: random.Random) -> str:
+    return f"`pip install {_slug(rng)}=={rng.randint(1, 9)}.{rng.randint(0, 20)}`"
+
+def _file_path(rng: random.Random) -> str:
+    if rng.random() < 0.2:
+        return "C:\\Users\\" + "\\".join(_slug(rng, 2) for _ in range(3)) + "\\settings.ini"
+    return "/" + "/".join(_slug(rng, 2) for _ in range(rng.randint(2, 5))) + ".yaml"
+
+def _json(rng: random.Random) -> str:
+    fields = ", ".join(f'"{rng.choice(WORDS)}": "{_slug(rng, 2)}"' for _ in range(rng.randint(2, 5)))
+    return "{" + fields + "}"
+
+def _identifier(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(3, 5))]
+    if rng.random() < 0.5:
+        return words[0] + "".join(word.capitalize() for word in words[1:])
+    return "_".join(words)
+
+def _version(rng: random.Random) -> str:
+    return f"{rng.randint(0, 20)}.{rng.randint(0, 99)}.{rng.randint(0, 999)}-{rng.choice(['beta', 'rc1', 'alpha2'])}"
+
+def _hash(rng: random.Random) -> str:
+    return "".join(rng.choice(string.hexdigits[:16]) for _ in range(rng.choice([32, 40, 64])))
+
+def _quoted(rng: random.Random) -> str:
+    return '"' + " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 12))) + '"'
+
+GENERATORS: Dict[ContentType, Callable[[random.Random], str]] = {
+    ContentType.URL: _url,
+    ContentType.EMAIL: _email,
+    ContentType.CODE_BLOCK: _code_block,
+    ContentType.INLINE_CODE: _inline_code,
+    ContentType.FILE_PATH: _file_path,
+    ContentType.JSON: _json,
+    ContentType.IDENTIFIER: _identifier,
+    ContentType.VERSION: _version,
+    ContentType.HASH: _hash,
+    ContentType.QUOTED: _quoted,
+}
+
+MIXES: Dict[str, Dict[ContentType, float]] = {
+    "prose": {},
+    "url_heavy": {ContentType.URL: 6, ContentType.EMAIL: 2, ContentType.FILE_PATH: 2},
+    "code_heavy": {ContentType.CODE_BLOCK: 5, ContentType.INLINE_CODE: 3, ContentType.IDENTIFIER: 2},
+    "json_heavy": {ContentType.JSON: 7, ContentType.QUOTED: 1, ContentType.HASH: 1, ContentType.VERSION: 1},
+    "mixed": {ctype: 1 for ctype in ContentType},
+}
+
+def generate_document(size: int, mix: str = "mixed", entity_density: float = 0.05, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    weights = MIXES[mix]
+    types = list(weights)
+    type_weights = [weights[ctype] for ctype in types]
+    parts = []
+    length = 0
+    while length < size:
+        if types and rng.random() < entity_density:
+            piece = GENERATORS[rng.choices(types, type_weights)[0]](rng)
+        else:
+            piece = rng.choice(WORDS)
+        parts.append(piece)
+        length += len(piece) + 1
+        if rng.random() < 0.08:
+            parts.append(".\n")
+    return " ".join(parts)
+
+def generate_corpus(
+    n_docs: int,
+    size: int,
+    mix: str = "mixed",
+    entity_density: float = 0.05,
+    seed: int = 0
+) -> List[str]:
+    return [generate_document(size, mix, entity_density, seed * 1_000_003 + i) for i in range(n_docs)]
@@ -1,16 +1,113 @@
-import numpy as np
+import math
+from collections import Counter
 from typing import List, Dict
 from compression_engine import CompressionResult
 
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+class QuantileSketch:
+    def __init__(self, low: float = -1.0, high: float = 1.0, bins: int = 2000):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.counts = [0] * bins
+        self.total = 0
+
+    def add(self, value: float):
+        index = int((value - self.low) / self.width)
+        self.counts[min(max(index, 0), self.bins - 1)] += 1
+        self.total += 1
+
+    def merge(self, other: "QuantileSketch"):
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Cannot merge quantile sketches with different bin layouts")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def quantile(self, q: float) -> float:
+        if self.total == 0:
+            return 0.0
+        rank = q * (self.total - 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return self.low + (index + 0.5) * self.width
+        return self.high
+
 class TokenAnalytics:
     GPT4_INPUT_COST_PER_1K = 0.03
 
-    def __init__(self, input_cost_per_1k: float = GPT4_INPUT_COST_PER_1K):
+    def __init__(
+        self,
+        input_cost_per_1k: float = GPT4_INPUT_COST_PER_1K,
+        keep_history: bool = True,
+        metrics_store=None
+    ):
         self.input_cost_per_1k = input_cost_per_1k
+        self.keep_history = keep_history
+        self.metrics_store = metrics_store
         self.results_history: List[CompressionResult] = []
+        self.total_original_tokens = 0
+        self.total_compressed_tokens = 0
+        self.total_cost_savings = 0.0
+        self.ratio_stats = RunningStats()
+        self.ratio_sketch = QuantileSketch()
+        self.content_type_counts = Counter()
 
     def add_result(self, result: CompressionResult):
-        self.results_history.append(result)
+        if self.keep_history:
+            self.results_history.append(result)
+        self.total_original_tokens += result.original_tokens
+        self.total_compressed_tokens += result.compressed_tokens
+        savings = self.calculate_cost_savings(result)['savings']
+        self.total_cost_savings += savings
+        if self.metrics_store is not None:
+            self.metrics_store.append_result(result, savings)
+        self.ratio_stats.add(result.savings_ratio)
+        self.ratio_sketch.add(result.savings_ratio)
+        self.content_type_counts.update(result.content_type_counts)
+
+    def merge(self, other: "TokenAnalytics") -> "TokenAnalytics":
+        if self.keep_history:
+            self.results_history.extend(other.results_history)
+        self.total_original_tokens += other.total_original_tokens
+        self.total_compressed_tokens += other.total_compressed_tokens
+        self.total_cost_savings += other.total_cost_savings
+        self.ratio_stats.merge(other.ratio_stats)
+        self.ratio_sketch.merge(other.ratio_sketch)
+        self.content_type_counts.update(other.content_type_counts)
+        return self
 
     def calculate_cost_savings(self, result: CompressionResult) -> Dict[str, float]:
         original_cost = (result.original_tokens / 1000) * self.input_cost_per_1k
@@ -23,17 +120,21 @@ class TokenAnalytics:
             'savings_percentage': (savings / original_cost * 100) if original_cost > 0 else 0
         }
 
+    def _ratio_quantile(self, q: float) -> float:
+        return min(max(self.ratio_sketch.quantile(q), self.ratio_stats.minimum), self.ratio_stats.maximum)
+
     def get_aggregate_stats(self) -> Dict:
-        if not self.results_history:
+        if self.ratio_stats.count == 0:
             return {}
-        total_original_tokens = sum(r.original_tokens for r in self.results_history)
-        total_compressed_tokens = sum(r.compressed_tokens for r in self.results_history)
-        total_savings = sum(self.calculate_cost_savings(r)['savings'] for r in self.results_history)
-        avg_compression_ratio = np.mean([r.savings_ratio for r in self.results_history])
         return {
-            'total_original_tokens': total_original_tokens,
-            'total_compressed_tokens': total_compressed_tokens,
-            'total_cost_savings': total_savings,
-            'average_compression_ratio': avg_compression_ratio,
-            'num_compressions': len(self.results_history)
-        }
\ No newline at end of file
+            'total_original_tokens': self.total_original_tokens,
+            'total_compressed_tokens': self.total_compressed_tokens,
+            'total_cost_savings': self.total_cost_savings,
+            'average_compression_ratio': self.ratio_stats.mean,
+            'compression_ratio_std': math.sqrt(self.ratio_stats.variance),
+            'compression_ratio_p50': self._ratio_quantile(0.5),
+            'compression_ratio_p90': self._ratio_quantile(0.9),
+            'compression_ratio_p99': self._ratio_quantile(0.99),
+            'content_type_counts': dict(self.content_type_counts),
+            'num_compressions': self.ratio_stats.count
+        }
@@ -0,0 +1,215 @@
+import json
+import re
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ASCII classes for HeuristicTokenizer, derived from the same str.split / \w / \s rules
+# as its regex path: SPACE_CLASSES maps whitespace to " " and everything else to "x";
+# deleting WORD_OR_SPACE leaves exactly the punctuation characters.
+ASCII_SPACE = bytes(i for i in range(128) if chr(i).isspace())
+WORD_OR_SPACE = bytes(i for i in range(128) if re.match(r'[\w\s]', chr(i)))
+SPACE_CLASSES = bytes(ord(" ") if i in ASCII_SPACE else ord("x") for i in range(256))
+PUNCTUATION_FLAGS = bytes(0 if i in WORD_OR_SPACE else 1 for i in range(256))
+# count_batch uses NumPy for at least this many texts averaging at most this many
+# characters; for longer texts count() is already faster per character.
+NUMPY_MIN_TEXTS = 1024
+NUMPY_MAX_MEAN_CHARS = 100
+
+class Tokenizer:
+    # True when the count of a placeholder does not depend on its digits, so
+    # renumbering placeholders (e.g. rebasing cached results) keeps counts valid.
+    placeholder_invariant = False
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+    def count_compressed(self, compressed_text: str, text: str, original_count: int, spans: Sequence[Tuple[int, int]]) -> int:
+        # Count of compressed_text, which is text with each (start, end) span replaced by a
+        # placeholder. Tokenizers that can derive it from original_count override this.
+        return self.count(compressed_text)
+
+class HeuristicTokenizer(Tokenizer):
+    # Whitespace-separated words plus non-word, non-space characters. ASCII text is
+    # counted with two bytes.translate passes instead of building lists of words and
+    # punctuation; other text uses the regex definition directly.
+    placeholder_invariant = True
+    PUNCTUATION = re.compile(r'[^\w\s]')
+    PLACEHOLDER_PUNCTUATION = 4
+
+    def count(self, text: str) -> int:
+        if text.isascii():
+            data = text.encode("ascii")
+            return self._count_words(data) + len(data.translate(None, WORD_OR_SPACE))
+        return len(text.split()) + len(self.PUNCTUATION.findall(text))
+
+    @staticmethod
+    def _count_words(data: bytes) -> int:
+        classes = data.translate(SPACE_CLASSES)
+        return classes.count(b" x") + classes.startswith(b"x")
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        # Many short ASCII texts are counted in one NumPy pass over their concatenation
+        # (joined and terminated by spaces so words never merge), which saves the
+        # per-call overhead that dominates for them. Longer texts, non-ASCII texts, or a
+        # missing NumPy fall back to count(). Counts are identical either way.
+        ascii_indices = [index for index, text in enumerate(texts) if text.isascii()]
+        total = sum(len(texts[index]) for index in ascii_indices)
+        if len(ascii_indices) < NUMPY_MIN_TEXTS or total > NUMPY_MAX_MEAN_CHARS * len(ascii_indices):
+            return [self.count(text) for text in texts]
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.count(text) for text in texts]
+
+        counts = [0 if text.isascii() else self.count(text) for text in texts]
+        data = " ".join(texts[index] for index in ascii_indices).encode("ascii") + b" "
+        nonspace = np.frombuffer(data.translate(SPACE_CLASSES), dtype=np.uint8) == ord("x")
+        tokens = np.frombuffer(data.translate(PUNCTUATION_FLAGS), dtype=np.uint8).copy()
+        tokens[0] += nonspace[0]
+        tokens[1:] += nonspace[1:] & ~nonspace[:-1]
+
+        offsets = np.cumsum([0] + [len(texts[index]) + 1 for index in ascii_indices[:-1]])
+        totals = np.add.reduceat(tokens, offsets, dtype=np.int64)
+        for index, total in zip(ascii_indices, totals.tolist()):
+            counts[index] = total
+        return counts
+
+    def count_compressed(self, compressed_text: str, text: str, original_count: int, spans: Sequence[Tuple[int, int]]) -> int:
+        # Exact delta: a placeholder is one word with four punctuation characters and no
+        # whitespace, so only word starts inside a span and right after it can change.
+        count = original_count
+        size = len(text)
+        previous_end = -1
+        for index, (start, end) in enumerate(spans):
+            content = text[start:end]
+            count += self.PLACEHOLDER_PUNCTUATION - self._count_punctuation(content)
+            # Word starts in the span: after a placeholder or non-space, the first
+            # character only continues a word.
+            before_is_space = start == 0 or (start != previous_end and text[start - 1].isspace())
+            old_before_is_space = start == 0 or text[start - 1].isspace()
+            words = self._count_text_words(content)
+            if content and not content[0].isspace() and not old_before_is_space:
+                words -= 1
+            count += before_is_space - words
+            # A word starting right after the span merges into the placeholder.
+            next_start = spans[index + 1][0] if index + 1 < len(spans) else -1
+            if end < size and end != next_start and content and content[-1].isspace() and not text[end].isspace():
+                count -= 1
+            previous_end = end
+        return count
+
+    def _count_punctuation(self, text: str) -> int:
+        if text.isascii():
+            return len(text.encode("ascii").translate(None, WORD_OR_SPACE))
+        return len(self.PUNCTUATION.findall(text))
+
+    def _count_text_words(self, text: str) -> int:
+        if text.isascii():
+            return self._count_words(text.encode("ascii"))
+        return len(text.split())
+
+def bytes_to_unicode() -> Dict[int, str]:
+    printable = (
+        list(range(ord("!"), ord("~") + 1)) +
+        list(range(ord("¡"), ord("¬") + 1)) +
+        list(range(ord("®"), ord("ÿ") + 1))
+    )
+    codepoints = printable[:]
+    shift = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            codepoints.append(256 + shift)
+            shift += 1
+    return dict(zip(printable, map(chr, codepoints)))
+
+class BPETokenizer(Tokenizer):
+    PRETOKENIZE = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+""")
+
+    def __init__(
+        self,
+        merges: List[Tuple[str, str]],
+        vocab: Optional[Dict[str, int]] = None,
+        cache_size: int = 65536
+    ):
+        self.ranks = {pair: rank for rank, pair in enumerate(merges)}
+        self.vocab = vocab
+        self.byte_encoder = bytes_to_unicode()
+        if vocab is not None:
+            # Every token _bpe can produce (a byte symbol or a merge result) needs an ID.
+            produced = chain(self.byte_encoder.values(), (first + second for first, second in merges))
+            missing = next((token for token in produced if token not in vocab), None)
+            if missing is not None:
+                raise ValueError(f"Token {missing!r} produced by the merges is not in the vocabulary")
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+
+    @classmethod
+    def from_files(cls, merges_path: str, vocab_path: Optional[str] = None, cache_size: int = 65536) -> "BPETokenizer":
+        merges = []
+        with open(merges_path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#version") or not line.strip():
+                    continue
+                first, second = line.rstrip("\n").split(" ")
+                merges.append((first, second))
+        vocab = None
+        if vocab_path is not None:
+            with open(vocab_path, encoding="utf-8") as f:
+                vocab = json.load(f)
+        return cls(merges, vocab, cache_size)
+
+    def count(self, text: str) -> int:
+        return sum(self._count_piece(piece) for piece in self.PRETOKENIZE.findall(text))
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens = []
+        for piece in self.PRETOKENIZE.findall(text):
+            tokens.extend(self._bpe(piece))
+        return tokens
+
+    def encode(self, text: str) -> List[int]:
+        if self.vocab is None:
+            raise ValueError("encode needs a vocabulary: pass vocab, or vocab_path to from_files")
+        vocab = self.vocab
+        return [vocab[token] for token in self.tokenize(text)]
+
+    def _count_piece(self, piece: str) -> int:
+        # Placeholder IDs and recurring entities pretokenize into the same few pieces,
+        # so the LRU keeps exact counting cheap on repetitive input.
+        count = self._cache.get(piece)
+        if count is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(piece)
+            return count
+        self.cache_misses += 1
+        count = len(self._bpe(piece))
+        self._cache[piece] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+
+    def _bpe(self, piece: str) -> List[str]:
+        word = [self.byte_encoder[byte] for byte in piece.encode("utf-8")]
+        ranks = self.ranks
+        while len(word) > 1:
+            best = min(zip(word, word[1:]), key=lambda pair: ranks.get(pair, float("inf")))
+            if best not in ranks:
+                break
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and word[i] == best[0] and word[i + 1] == best[1]:
+                    merged.append(best[0] + best[1])
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = merged
+        return word
@@ -4,6 +4,11 @@ import numpy as np
 import pandas as pd
 from scipy import stats
 from scipy.interpolate import make_interp_spline
+from pattern_detector import PatternDetector
+from compression_engine import CompressionEngine
+from restoration_engine import RestorationEngine
+from token_analytics import TokenAnalytics
+from metrics_store import MetricsStore
 
 plt.rcParams['font.family'] = 'serif'
 plt.rcParams['font.serif'] = ['Times New Roman'] + plt.rcParams['font.serif']
@@ -22,8 +27,19 @@ def create_modern_comprehensive_figure(result, analytics, batch_results, batch_a
     Combined Modern Scientific Visualization
     Split into two separate figures for better clarity
     """
-    n_samples = len(batch_results)
-    compression_ratios = np.array([r.savings_ratio * 100 for r in batch_results])
+    store = getattr(batch_analytics, 'metrics_store', None)
+    if store is not None and len(store):
+        n_samples = len(store)
+        compression_ratios = store.column('savings_ratio').astype(np.float64) * 100
+        cumulative_savings = store.cumulative_savings()
+        original_tokens = store.column('original_tokens').astype(np.float64)
+        compressed_tokens = store.column('compressed_tokens').astype(np.float64)
+    else:
+        n_samples = len(batch_results)
+        compression_ratios = np.array([r.savings_ratio * 100 for r in batch_results])
+        cumulative_savings = np.cumsum([batch_analytics.calculate_cost_savings(r)['savings'] for r in batch_results])
+        original_tokens = np.array([r.original_tokens for r in batch_results])
+        compressed_tokens = np.array([r.compressed_tokens for r in batch_results])
     avg_compression = np.mean(compression_ratios)
     
     fig1 = plt.figure(figsize=(18, 8))
@@ -72,13 +88,6 @@ def create_modern_comprehensive_figure(result, analytics, batch_results, batch_a
     
     ax_b = fig1.add_subplot(gs1[0, 1])
     
-    cumulative_savings = []
-    running_total = 0
-    for r in batch_results:
-        cost_data = batch_analytics.calculate_cost_savings(r)
-        running_total += cost_data['savings']
-        cumulative_savings.append(running_total)
-    
     x_range_savings = np.arange(1, len(cumulative_savings) + 1)
     
     if len(x_range_savings) > 3:
@@ -191,9 +200,7 @@ def create_modern_comprehensive_figure(result, analytics, batch_results, batch_a
     
     ax_d = fig2.add_subplot(gs2[0, 1])
     
-    original_tokens = np.array([r.original_tokens for r in batch_results])
-    compressed_tokens = np.array([r.compressed_tokens for r in batch_results])
-    x = np.arange(len(batch_results))
+    x = np.arange(n_samples)
     
     avg_reduction = np.mean((original_tokens - compressed_tokens) / original_tokens * 100)
     
@@ -220,8 +227,8 @@ def create_modern_comprehensive_figure(result, analytics, batch_results, batch_a
     ax_d.set_xlabel('Sample Index', fontsize=14, fontweight='bold')
     ax_d.set_ylabel('Token Count', fontsize=14, fontweight='bold')
     
-    n_ticks = min(20, len(batch_results))
-    tick_indices = np.linspace(0, len(batch_results)-1, n_ticks, dtype=int)
+    n_ticks = min(20, n_samples)
+    tick_indices = np.linspace(0, n_samples-1, n_ticks, dtype=int)
     ax_d.set_xticks(tick_indices)
     ax_d.set_xticklabels([f'{i+1}' for i in tick_indices], fontsize=9, rotation=45)
     
@@ -372,50 +379,54 @@ batch_texts = [
     "Console https://administration-portal.enterprise-resource-planning-system.com/modules"
 ]
 
-detector = PatternDetector(min_length=15)
-compressor = CompressionEngine(detector)
-analytics = TokenAnalytics()
+def main():
+    detector = PatternDetector(min_length=15)
+    compressor = CompressionEngine(detector)
+    analytics = TokenAnalytics()
+
+    print("="*80)
+    print("DEMO: SINGLE TEXT COMPRESSION")
+    print("="*80 + "\n")
 
-print("="*80)
-print("DEMO: SINGLE TEXT COMPRESSION")
-print("="*80 + "\n")
+    result = compressor.compress(sample_text)
+    analytics.add_result(result)
 
-result = compressor.compress(sample_text)
-analytics.add_result(result)
 
+    restored, integrity, errors = RestorationEngine.restore(
+        result.compressed_text, 
+        result.placeholders
+    )
 
-restored, integrity, errors = RestorationEngine.restore(
-    result.compressed_text, 
-    result.placeholders
-)
 
+    print("\n" + "="*80)
+    print("DEMO: BATCH PROCESSING")
+    print("="*80 + "\n")
 
-print("\n" + "="*80)
-print("DEMO: BATCH PROCESSING")
-print("="*80 + "\n")
+    compressor.reset_counter()
+    batch_analytics = TokenAnalytics(metrics_store=MetricsStore())
+    batch_results = []
 
-compressor.reset_counter()
-batch_analytics = TokenAnalytics()
-batch_results = []
+    for idx, text in enumerate(batch_texts):
+        result_batch = compressor.compress(text)
+        batch_analytics.add_result(result_batch)
+        batch_results.append(result_batch)
+        if idx < 10 or idx % 10 == 0:  # Print first 10 and every 10th
+            print(f"Text {idx + 1}: {result_batch.original_tokens} → {result_batch.compressed_tokens} "
+                  f"({result_batch.savings_ratio:.1%} saved)")
 
-for idx, text in enumerate(batch_texts):
-    result_batch = compressor.compress(text)
-    batch_analytics.add_result(result_batch)
-    batch_results.append(result_batch)
-    if idx < 10 or idx % 10 == 0:  # Print first 10 and every 10th
-        print(f"Text {idx + 1}: {result_batch.original_tokens} → {result_batch.compressed_tokens} "
-              f"({result_batch.savings_ratio:.1%} saved)")
+    aggregate_stats = batch_analytics.get_aggregate_stats()
+    print(f"\nTotal compressions: {aggregate_stats['num_compressions']}")
+    print(f"Average compression ratio: {aggregate_stats['average_compression_ratio']:.1%}")
+    print(f"Total cost savings: ${aggregate_stats['total_cost_savings']:.4f}")
 
-aggregate_stats = batch_analytics.get_aggregate_stats()
-print(f"\nTotal compressions: {aggregate_stats['num_compressions']}")
-print(f"Average compression ratio: {aggregate_stats['average_compression_ratio']:.1%}")
-print(f"Total cost savings: ${aggregate_stats['total_cost_savings']:.4f}")
+    print("\n" + "="*80)
+    print("GENERATING MODERN COMPREHENSIVE FIGURE")
+    print("="*80 + "\n")
 
-print("\n" + "="*80)
-print("GENERATING MODERN COMPREHENSIVE FIGURE")
-print("="*80 + "\n")
+    create_modern_comprehensive_figure(result, analytics, batch_results, batch_analytics)
+    plt.show()
 
-fig = create_modern_comprehensive_figure(result, analytics, batch_results, batch_analytics)
-plt.show()
+    print("\n✓ All visualizations complete")
 
-print("\n✓ All visualizations complete")
\ No newline at end of file
+if __name__ == "__main__":
+    main()